@@ -2,6 +2,20 @@ import socket
 import sys
 
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api_v1.auth.service import token_cache
+from api_v1.db.session import pool_stats
+from api_v1.service.scheduler import daily_scheduler
+from api_v1.service.service import (
+    currency_directory,
+    daily_cache,
+    response_cache,
+    unit_rate_index,
+    upstream_flight,
+    upstream_limiter,
+)
+from core.metrics import metrics
 
 router = APIRouter()
 
@@ -9,6 +23,80 @@ hostname = socket.gethostname()
 
 version = f"{sys.version_info.major}.{sys.version_info.minor}"
 
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Счётчики кэшей, лимитов и пула уже ведутся объектами и читаются при выдаче
+metrics.callback(
+    "cbr_api_cache_hits_total",
+    "Попадания в кэши",
+    lambda: {
+        ("daily_memory",): daily_cache.memory.hits,
+        ("daily_disk",): daily_cache.disk_hits,
+        ("response",): response_cache.hits,
+        ("token",): token_cache.hits,
+    },
+    labels=("cache",),
+    kind="counter",
+)
+metrics.callback(
+    "cbr_api_cache_misses_total",
+    "Промахи кэшей",
+    lambda: {
+        ("daily_memory",): daily_cache.memory.misses,
+        ("response",): response_cache.misses,
+        ("token",): token_cache.misses,
+    },
+    labels=("cache",),
+    kind="counter",
+)
+metrics.callback(
+    "cbr_api_cache_entries",
+    "Записей в кэшах",
+    lambda: {
+        ("daily_memory",): len(daily_cache.memory),
+        ("response",): len(response_cache),
+        ("token",): len(token_cache),
+        ("currency_directory",): len(currency_directory.items),
+    },
+    labels=("cache",),
+)
+metrics.callback(
+    "cbr_api_response_cache_bytes",
+    "Объём тел ответов и их сжатых вариантов в кэше, байт",
+    lambda: response_cache.weight,
+)
+metrics.callback(
+    "cbr_api_upstream_coalesced_total",
+    "Запросы к ЦБ РФ, присоединившиеся к уже выполняющемуся такому же запросу",
+    lambda: upstream_flight.coalesced,
+    kind="counter",
+)
+metrics.callback(
+    "cbr_api_upstream_limiter_wait_seconds_total",
+    "Суммарное ожидание лимитов обращений к ЦБ РФ, сек.",
+    lambda: upstream_limiter.wait_time_total,
+    kind="counter",
+)
+metrics.callback(
+    "cbr_api_upstream_in_flight",
+    "Выполняющиеся и ожидающие лимитов запросы к ЦБ РФ",
+    lambda: {
+        ("active",): upstream_limiter.active,
+        ("waiting",): upstream_limiter.waiting,
+    },
+    labels=("state",),
+)
+metrics.callback(
+    "cbr_api_db_pool_connections",
+    "Соединения пула базы данных",
+    lambda: {
+        (state,): count
+        for state, count in pool_stats().items()
+        if state in ("checked_in", "checked_out")
+    },
+    labels=("state",),
+)
+
 
 @router.get(
     "",
@@ -20,3 +108,42 @@ async def info():
         "version": "1.0.0",
         "description": f"FastAPI app running on Uvicorn. Using Python {version}",
     }
+
+
+@router.get(
+    "/upstream",
+    tags=["Info"],
+)
+async def upstream_info():
+    return {
+        "coalescing": upstream_flight.stats(),
+        "limiter": upstream_limiter.stats(),
+        "daily_cache": daily_cache.stats(),
+        "unit_rate_index": unit_rate_index.stats(),
+    }
+
+
+@router.get(
+    "/scheduler",
+    tags=["Info"],
+)
+async def scheduler_info():
+    return daily_scheduler.stats()
+
+
+@router.get(
+    "/db",
+    tags=["Info"],
+)
+async def db_info():
+    return pool_stats()
+
+
+@router.get(
+    "/metrics",
+    tags=["Info"],
+    response_class=PlainTextResponse,
+    summary="Метрики в текстовом формате Prometheus",
+)
+async def metrics_info():
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
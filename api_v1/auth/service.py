@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 
 import jwt
@@ -15,7 +16,8 @@ from api_v1.db.crud import async_create_db
 from api_v1.db.models.models import Token
 from api_v1.db.session import async_session_factory
 from core.config import settings
-
+from core.metrics import auth_check_seconds
+from utils.cache import LRUCache
 
 token_header_auth = APIKeyHeader(
     name="Authorization",
@@ -28,6 +30,10 @@ SECRET_KEY = settings.auth.JWT_SECRET
 ALGORITHM = settings.auth.JWT_ALG
 ACCESS_TOKEN_EXPIRE_DAYS = settings.auth.JWT_EXP
 
+# Проверенные токены и их данные. Токен, заменённый в другом процессе,
+# остаётся действительным здесь не дольше AUTH_CACHE_TTL
+token_cache = LRUCache(settings.auth.AUTH_CACHE_SIZE)
+
 
 async def is_valid_jwt(token):
     try:
@@ -43,6 +49,21 @@ async def is_valid_jwt(token):
 
 
 async def is_valid_token(token: str = Security(token_header_auth)):
+    started_at = time.perf_counter()
+    result = "rejected"
+    try:
+        token = await check_token(token)
+        result = "accepted"
+        return token
+    finally:
+        auth_check_seconds.observe(time.perf_counter() - started_at, result)
+
+
+async def check_token(token: str | None) -> str:
+    # Проверенный ранее токен не проверяется повторно до истечения срока в кэше
+    if token and token_cache.get(token) is not None:
+        return token
+
     # Check if token is not empty
     if not token or not await check_token_to_db(token):
         raise HTTPException(
@@ -51,7 +72,8 @@ async def is_valid_token(token: str = Security(token_header_auth)):
         )
 
     # Check if token is valid
-    if not await is_valid_jwt(token):
+    claims = await is_valid_jwt(token)
+    if not claims:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid Token, not a valid JWT",
@@ -71,9 +93,23 @@ async def is_valid_token(token: str = Security(token_header_auth)):
             detail="Invalid Token! It should not contain spaces.",
         )
 
+    cache_token(token, claims)
     return token
 
 
+def cache_token(token: str, claims: dict) -> None:
+    """
+    Сохранить проверенный токен в кэше
+    :param token: Токен
+    :param claims: Данные токена, срок жизни в кэше не превышает срок действия токена
+    """
+    ttl = settings.auth.AUTH_CACHE_TTL
+    if isinstance(claims.get("exp"), (int, float)):
+        ttl = min(ttl, claims["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, claims, ttl=ttl)
+
+
 async def create_access_token(data: dict, expires_delta: timedelta = None):
     # Create access token
     to_encode = data.copy()
@@ -102,7 +138,8 @@ async def save_token_to_db(email: str, token: str, session):
     token_entry = result.scalars().first()
 
     if token_entry:
-        # Если запись существует, обновляем токен
+        # Если запись существует, обновляем токен. Прежний токен удаляется из кэша
+        token_cache.pop(token_entry.token)
         token_entry.token = token
     else:
         # Если записи нет, создаем новую
@@ -1,4 +1,5 @@
 import json
+from decimal import Decimal
 from typing import Annotated
 
 from sqlalchemy import (
@@ -14,6 +15,7 @@ from sqlalchemy import (
     Uuid,
     BigInteger,
     Integer,
+    Numeric,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
 from uuid import uuid4
@@ -51,6 +53,39 @@ class JSONType(TypeDecorator):
 
 types.JSONType = JSONType
 
+
+class ScaledNumeric(TypeDecorator):
+    """
+    Точное десятичное число: NUMERIC в PostgreSQL и целое число с фиксированным
+    масштабом в SQLite, где NUMERIC хранится как число с плавающей точкой
+    """
+
+    impl = Numeric
+    cache_ok = True
+
+    def __init__(self, precision: int = 20, scale: int = 10):
+        super().__init__(precision=precision, scale=scale, asdecimal=True)
+        self.precision = precision
+        self.scale = scale
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(BigInteger())
+        return dialect.type_descriptor(
+            Numeric(precision=self.precision, scale=self.scale, asdecimal=True)
+        )
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        return int(Decimal(value).scaleb(self.scale).to_integral_value())
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        return Decimal(value).scaleb(-self.scale)
+
+
 metadata = MetaData(
     naming_convention={
         "ix": "ix_%(column_0_label)s",
@@ -120,6 +155,7 @@ class Base(DeclarativeBase):
         str_50: String(50),
         str_256: String(256),
         str_1000: String(1000),
+        Decimal: ScaledNumeric(),
     }
 
     @declared_attr
@@ -1,3 +1,8 @@
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import Index
+
 from .base import (
     Base,
     Mapped,
@@ -27,10 +32,25 @@ class ExchangeRate(Base):
     id: Mapped[int_pk]
     date: Mapped[str | None] = mapped_column(Date, default=None)
     cb_code: Mapped[str]
-    iso_code: Mapped[str]
+    iso_code: Mapped[str | None]
     nominal: Mapped[int]
-    value: Mapped[str]
-    unit_rate: Mapped[str]
+    value: Mapped[Decimal]
+    unit_rate: Mapped[Decimal]
+
+    __table_args__ = (
+        Index("ix_exchange_rates_cb_code_date", "cb_code", "date", unique=True),
+    )
+
+    repr_cols_num = Base.get_num_keys()
+
+
+class ExchangeRateCoverage(Base):
+    """Таблица загруженных из ЦБ РФ периодов курсов валют"""
+
+    id: Mapped[int_pk]
+    cb_code: Mapped[str] = mapped_column(index=True)
+    date_from: Mapped[date] = mapped_column(Date)
+    date_to: Mapped[date] = mapped_column(Date)
 
     repr_cols_num = Base.get_num_keys()
 
@@ -40,6 +60,6 @@ class Token(Base):
 
     id: Mapped[int_pk]
     email: Mapped[str]
-    token: Mapped[str]
+    token: Mapped[str] = mapped_column(index=True)
 
     repr_cols_num = Base.get_num_keys()
@@ -15,6 +15,7 @@ from sqlalchemy import (
     or_,
     and_,
 )
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -164,6 +165,59 @@ class SQLAlchemyRepository(AbstractRepository):
             await self.session.rollback()  # В случае ошибки откатываем транзакцию
             raise e  # Пробрасываем исключение дальше для логирования или обработки
 
+    async def upsert_many(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_columns: Sequence[str] | None = None,
+        chunk_size: int = 20000,
+    ) -> int:
+        """
+        Insert rows or update existing ones with INSERT ... ON CONFLICT DO UPDATE.
+        Rows are sent with executemany in chunks, existing rows are updated only
+        when values differ. The transaction is not committed.
+
+        :param rows: Rows as dictionaries of column values
+        :param index_elements: Columns of the unique index which defines a conflict
+        :param update_columns: (Optional) Columns to update, by default all except
+            index_elements and the primary key
+        :param chunk_size: (Optional) Count of rows in one executemany
+        :return: Count of passed rows
+        """
+        if not rows:
+            return 0
+
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            statement = postgresql.insert(self.model)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(self.model)
+        else:
+            raise NotImplementedError(f"Upsert is not supported for {dialect}")
+
+        table = self.model.__table__
+        if update_columns is None:
+            update_columns = [
+                column.name
+                for column in table.columns
+                if column.name not in index_elements and not column.primary_key
+            ]
+
+        statement = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={name: statement.excluded[name] for name in update_columns},
+            where=or_(
+                *(
+                    table.c[name].is_distinct_from(statement.excluded[name])
+                    for name in update_columns
+                )
+            ),
+        )
+
+        for i in range(0, len(rows), chunk_size):
+            await self.session.execute(statement, rows[i : i + chunk_size])
+        return len(rows)
+
     async def insert(self, **kwargs) -> AbstractModel:
         """
         Insert a new model into the database
@@ -1,22 +1,29 @@
+import time
 from collections.abc import AsyncGenerator
 from typing import Annotated
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy import (
+    event,
     select,
     delete,
 )
 
 from core.config import settings
-
+from core.metrics import db_query_seconds
 
 async_engine = create_async_engine(
     url=settings.db.url_sqlite if settings.use_sqlite else settings.db.url_postgres,
     echo=settings.db.ECHO,
-    pool_pre_ping=True,
-    poolclass=NullPool,
+    # Для файла SQLite aiosqlite по умолчанию не использует пул соединений
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.db.DB_POOL_SIZE,
+    max_overflow=settings.db.DB_MAX_OVERFLOW,
+    pool_timeout=settings.db.DB_POOL_TIMEOUT,
+    pool_recycle=settings.db.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.db.DB_POOL_PRE_PING,
 )
 
 async_session_factory = async_sessionmaker(
@@ -24,6 +31,55 @@ async_session_factory = async_sessionmaker(
 )
 
 
+if settings.use_sqlite:
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        # Настройки SQLite действуют на соединение и задаются при его открытии
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.db.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.db.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.db.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={settings.db.SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.db.SQLITE_BUSY_TIMEOUT}")
+        cursor.close()
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info["query_started_at"].pop()
+    # Вид запроса по первому слову: SELECT, INSERT, DELETE, ...
+    db_query_seconds.observe(
+        time.perf_counter() - started_at, statement.split(None, 1)[0].upper()
+    )
+
+
+@event.listens_for(async_engine.sync_engine, "handle_error")
+def drop_query_timer(context):
+    # После ошибки after_cursor_execute не вызывается
+    if context.connection is None or context.cursor is None:
+        return
+    started_at = context.connection.info.get("query_started_at")
+    if started_at:
+        started_at.pop()
+
+
+def pool_stats() -> dict:
+    pool = async_engine.pool
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_factory() as session:
         yield session
@@ -0,0 +1,277 @@
+from datetime import date, datetime, timedelta
+
+import aiohttp
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.service.service import (
+    MIN_DATE,
+    currency_directory,
+    sync_rates,
+    tz,
+    unit_rate_index,
+)
+from api_v1.service.store import read_unit_rates
+from core.config import settings
+
+# Рубль в котировках ЦБ РФ не публикуется, его курс всегда 1
+RUB = "RUB"
+
+# Календарные периоды агрегации и их обозначения в pandas, метка - начало периода
+PERIODS = {
+    "week": "W-MON",
+    "month": "MS",
+    "quarter": "QS",
+    "year": "YS",
+}
+
+
+async def resolve_cb_codes(
+    client: aiohttp.ClientSession, iso_codes: list[str]
+) -> dict[str, str]:
+    """ISO коды валют по кодам ЦБ РФ, без RUB"""
+    directory = await currency_directory.get(client)
+
+    cb_codes = {}
+    for iso_code in dict.fromkeys(iso_codes):
+        if iso_code == RUB:
+            continue
+        currency_info = directory.by_iso_code.get(iso_code)
+        if currency_info is None:
+            raise ValueError(f"Unknown currency: {iso_code}")
+        cb_codes[currency_info["cb_code"]] = iso_code
+    return cb_codes
+
+
+async def load_unit_rates(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    iso_codes: list[str],
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> pd.DataFrame:
+    """
+    Курсы за единицу валюты из хранилища, недостающие периоды дозагружаются.
+
+    :param session: Сессия базы данных
+    :param client: Сессия aiohttp для обращения к ЦБ РФ
+    :param iso_codes: ISO коды валют, RUB допускается
+    :param date_from: (Optional) Начало периода в формате `RFC3339`
+    :param date_to: (Optional) Конец периода в формате `RFC3339`
+    :return: Таблица с датами в индексе и ISO кодами валют в столбцах
+    """
+    cb_codes = await resolve_cb_codes(client, iso_codes)
+
+    start_date = datetime.fromisoformat(date_from).date() if date_from else MIN_DATE
+    end_date = (
+        datetime.fromisoformat(date_to).date()
+        if date_to
+        else datetime.now(tz=tz).date()
+    )
+
+    await sync_rates(session, client, list(cb_codes), start_date, end_date)
+    rows = await read_unit_rates(session, list(cb_codes), start_date, end_date)
+
+    frame = (
+        pd.DataFrame(rows, columns=["cb_code", "date", "unit_rate"])
+        .pivot(index="date", columns="cb_code", values="unit_rate")
+        .rename(columns=cb_codes)
+        .reindex(columns=list(cb_codes.values()))
+        .sort_index()
+    )
+    frame.index = pd.to_datetime(frame.index, format="ISO8601")
+
+    if RUB in iso_codes:
+        frame[RUB] = 1.0
+    return frame
+
+
+def cross_rates(frame: pd.DataFrame, pairs: list[tuple[str, str]]) -> list[dict]:
+    """
+    Кросс-курсы по парам валют: цена единицы первой валюты во второй.
+    Курс считается только на даты, на которые есть котировки обеих валют.
+
+    :param frame: Курсы за единицу валюты из load_unit_rates
+    :param pairs: Пары ISO кодов валют (base, quote)
+    :return: Кросс-курсы, упорядоченные по паре и дате
+    """
+    items = []
+    for base, quote in pairs:
+        pair = (frame[[base, quote]] if base != quote else frame[[base]]).dropna()
+        rates = np.round(
+            pair[base].to_numpy() / pair[quote].to_numpy(), decimals=8
+        ).tolist()
+        dates = format_dates(pair.index)
+
+        name = f"{base}/{quote}"
+        items.extend(
+            {"date": rate_date, "pair": name, "rate": rate}
+            for rate_date, rate in zip(dates, rates)
+        )
+    return items
+
+
+def resample_ohlc(frame: pd.DataFrame, period: str) -> list[dict]:
+    """
+    Курсы по календарным периодам: открытие, максимум, минимум, закрытие
+    и среднее за период по датам с котировками.
+
+    :param frame: Курсы за единицу валюты из load_unit_rates
+    :param period: Период из PERIODS
+    :return: Агрегаты, упорядоченные по валюте и началу периода
+    """
+    items = []
+    for iso_code in frame.columns:
+        series = frame[iso_code].dropna()
+        buckets = series.resample(PERIODS[period], label="left", closed="left").agg(
+            ["first", "max", "min", "last", "mean", "count"]
+        )
+        buckets = buckets[buckets["count"] > 0]
+
+        dates = format_dates(buckets.index)
+        values = np.round(
+            buckets[["first", "max", "min", "last", "mean"]].to_numpy(), decimals=8
+        ).tolist()
+        counts = buckets["count"].tolist()
+
+        items.extend(
+            {
+                "date": bucket_date,
+                "iso_code": iso_code,
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "mean": mean,
+                "count": count,
+            }
+            for bucket_date, (open_, high, low, close, mean), count in zip(
+                dates, values, counts
+            )
+        )
+    return items
+
+
+def convert_amounts(
+    series: dict[str, tuple[np.ndarray, np.ndarray]],
+    items: list[dict],
+    lookback: int = settings.cbr.CBR_CONVERT_LOOKBACK_DAYS,
+) -> list[dict]:
+    """
+    Пересчёт сумм в рубли по последнему курсу валюты на дату или ранее,
+    поэтому на выходные и праздники берётся курс предыдущего рабочего дня.
+    Курсы валюты упорядочены по дате, курсы для всех сумм валюты находятся
+    одним векторным двоичным поиском по массиву дат.
+
+    :param series: Даты и курсы за единицу валюты по ISO кодам из UnitRateIndex
+    :param items: Суммы {"amount", "currency", "date"}
+    :param lookback: Насколько курс может быть старше даты суммы, дней
+    :return: Суммы в порядке items, без курса rate и amount_rub равны None
+    """
+    amounts = np.array([item["amount"] for item in items], dtype=np.float64)
+    currencies = np.array([item["currency"] for item in items])
+    dates = np.array([item["date"] for item in items], dtype="datetime64[D]")
+
+    rates = np.full(len(items), np.nan)
+    rate_dates = np.full(len(items), np.datetime64("NaT"), dtype="datetime64[D]")
+
+    for iso_code in np.unique(currencies):
+        if iso_code == RUB:
+            rubles = currencies == RUB
+            rates[rubles] = 1.0
+            rate_dates[rubles] = dates[rubles]
+            continue
+
+        series_dates, series_rates = series[iso_code]
+        if not len(series_dates):
+            continue
+
+        (positions,) = np.nonzero(currencies == iso_code)
+        found = np.searchsorted(series_dates, dates[positions], side="right") - 1
+        valid = found >= 0
+        valid[valid] = dates[positions[valid]] - series_dates[
+            found[valid]
+        ] <= np.timedelta64(lookback, "D")
+
+        rates[positions[valid]] = series_rates[found[valid]]
+        rate_dates[positions[valid]] = series_dates[found[valid]]
+
+    converted = np.round(amounts * rates, decimals=8)
+    return [
+        {
+            "amount": amount,
+            "currency": currency,
+            "date": item_date,
+            "rate_date": rate_date,
+            "rate": None if rate_date is None else rate,
+            "amount_rub": None if rate_date is None else amount_rub,
+        }
+        for amount, currency, item_date, rate_date, rate, amount_rub in zip(
+            amounts.tolist(),
+            currencies.tolist(),
+            format_dates(dates),
+            format_dates(rate_dates),
+            rates.tolist(),
+            converted.tolist(),
+        )
+    ]
+
+
+def format_dates(index: pd.DatetimeIndex | np.ndarray) -> list[str | None]:
+    """Даты в формате ЦБ РФ `dd.mm.yyyy`, без поэлементного strftime"""
+    values = index if isinstance(index, np.ndarray) else index.to_numpy()
+    return [
+        f"{iso[8:10]}.{iso[5:7]}.{iso[:4]}" if iso != "NaT" else None
+        for iso in np.datetime_as_string(values, unit="D")
+    ]
+
+
+async def exchange_ohlc(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    iso_codes: list[str],
+    period: str,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> list[dict]:
+    frame = await load_unit_rates(session, client, iso_codes, date_from, date_to)
+    return resample_ohlc(frame, period)
+
+
+async def exchange_cross_rates(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    pairs: list[tuple[str, str]],
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> list[dict]:
+    iso_codes = [iso_code for pair in pairs for iso_code in pair]
+    frame = await load_unit_rates(session, client, iso_codes, date_from, date_to)
+    return cross_rates(frame, pairs)
+
+
+async def exchange_convert(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    items: list[dict],
+) -> list[dict]:
+    iso_codes = list(dict.fromkeys(item["currency"] for item in items))
+    cb_codes = await resolve_cb_codes(client, iso_codes)
+    item_dates = [item["date"] for item in items]
+    # Курс на первую дату мог быть опубликован раньше неё
+    date_from = max(
+        min(item_dates) - timedelta(days=settings.cbr.CBR_CONVERT_LOOKBACK_DAYS),
+        MIN_DATE,
+    )
+    await sync_rates(session, client, list(cb_codes), date_from, max(item_dates))
+
+    # Курсы за всю историю валюты читаются один раз и хранятся в индексе до
+    # изменения её котировок, суммы за любые даты ищутся по тем же массивам
+    series = await unit_rate_index.get(
+        list(cb_codes),
+        lambda missing: read_unit_rates(session, missing, MIN_DATE, date.max),
+    )
+    return convert_amounts(
+        {iso_code: series[cb_code] for cb_code, iso_code in cb_codes.items()}, items
+    )
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import date
+
+import aiohttp
+import numpy as np
+import orjson
+
+from utils.cache import LRUCache
+
+
+class CurrencyDirectory:
+    """
+    Справочник кодов валют ЦБ РФ в памяти процесса.
+
+    Устаревший справочник отдаётся сразу и обновляется в фоне, одновременные
+    промахи ожидают одну и ту же загрузку из ЦБ РФ.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[aiohttp.ClientSession], Awaitable[list[dict]]],
+        ttl: float,
+    ):
+        """
+        :param loader: Загрузка справочника из ЦБ РФ в виде списка словарей
+        :param ttl: Время жизни справочника, сек.
+        """
+        self.loader = loader
+        self.ttl = ttl
+
+        self.items: list[dict] = []
+        self.by_cb_code: dict[str, dict] = {}
+        self.by_iso_code: dict[str, dict] = {}
+        self.by_iso_id: dict[int, dict] = {}
+        self.updated_at: float | None = None
+
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at > self.ttl
+
+    async def get(self, client: aiohttp.ClientSession) -> "CurrencyDirectory":
+        """
+        Получить справочник, загрузив его при первом обращении
+        :param client: Сессия aiohttp для обращения к ЦБ РФ
+        :return: Справочник с заполненными индексами
+        """
+        if not self.items:
+            await self.refresh(client)
+        elif self.is_stale:
+            self._start_refresh(client)
+        return self
+
+    async def refresh(self, client: aiohttp.ClientSession) -> None:
+        """Обновить справочник, дождавшись уже идущей загрузки при её наличии"""
+        await asyncio.shield(self._start_refresh(client))
+
+    def _start_refresh(self, client: aiohttp.ClientSession) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._load(client))
+        return self._refresh_task
+
+    async def _load(self, client: aiohttp.ClientSession) -> None:
+        try:
+            items = await self.loader(client)
+        except Exception as e:
+            logging.error("Currency directory refresh error: %s", e, exc_info=True)
+            return
+
+        # Пустой ответ не затирает ранее загруженный справочник
+        if items:
+            self.set(items)
+
+    def set(self, items: list[dict]) -> None:
+        by_cb_code, by_iso_code, by_iso_id = {}, {}, {}
+        for item in items:
+            by_cb_code[item["cb_code"]] = item
+            # Один ISO код может встречаться у нескольких кодов ЦБ РФ, берём первый
+            if item.get("iso_code"):
+                by_iso_code.setdefault(item["iso_code"], item)
+            if item.get("iso_id"):
+                by_iso_id.setdefault(item["iso_id"], item)
+
+        self.items = items
+        self.by_cb_code = by_cb_code
+        self.by_iso_code = by_iso_code
+        self.by_iso_id = by_iso_id
+        self.updated_at = time.monotonic()
+
+
+class DailyRateCache:
+    """
+    Кэш котировок на дату: LRU в памяти и файлы на диске.
+
+    Котировки на прошедшие даты не меняются и хранятся без срока жизни, в том
+    числе на диске. Котировки на сегодня и завтра хранятся только в памяти
+    с коротким временем жизни.
+    """
+
+    def __init__(self, maxsize: int, recent_ttl: float, path: str | None = None):
+        """
+        :param maxsize: Число дат в памяти
+        :param recent_ttl: Время жизни котировок на сегодня и завтра, сек.
+        :param path: (Optional) Каталог постоянного кэша, без него кэш только в памяти
+        """
+        self.memory = LRUCache(maxsize)
+        self.recent_ttl = recent_ttl
+        self.path = path
+        self.disk_hits = 0
+
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    async def get(self, key: str) -> list[dict] | None:
+        rows = self.memory.get(key)
+        if rows is not None or not self.path:
+            return rows
+
+        rows = await asyncio.to_thread(self._read, key)
+        if rows is not None:
+            self.disk_hits += 1
+            self.memory.set(key, rows)
+        return rows
+
+    async def set(
+        self, key: str, rows: list[dict], immutable: bool, ttl: float | None = None
+    ) -> None:
+        """
+        Сохранить котировки
+        :param key: Дата котировок
+        :param rows: Котировки
+        :param immutable: Котировки больше не изменятся и сохраняются без срока жизни
+        :param ttl: (Optional) Время жизни изменяемых котировок вместо recent_ttl, сек.
+        """
+        if not immutable:
+            self.memory.set(key, rows, ttl=ttl or self.recent_ttl)
+            return
+
+        self.memory.set(key, rows)
+        if self.path:
+            await asyncio.to_thread(self._write, key, rows)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def _read(self, key: str) -> list[dict] | None:
+        try:
+            with open(self._file(key), "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError) as e:
+            logging.error("Daily rate cache read error: %s", e)
+            return None
+
+    def _write(self, key: str, rows: list[dict]) -> None:
+        file = self._file(key)
+        try:
+            # Запись через временный файл, чтобы не оставить обрезанный кэш
+            with open(f"{file}.tmp", "wb") as f:
+                f.write(orjson.dumps(rows))
+            os.replace(f"{file}.tmp", file)
+        except OSError as e:
+            logging.error("Daily rate cache write error: %s", e)
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits}
+
+
+class UnitRateIndex:
+    """
+    Курсы за единицу валюты в памяти процесса: по коду ЦБ РФ упорядоченные
+    массивы дат и курсов за всю загруженную историю для двоичного поиска.
+
+    Код валюты сбрасывается после транзакции, изменившей его котировки или
+    загруженные периоды, и перечитывается из хранилища при следующем обращении.
+    Чтение, начатое до сброса, в индекс не попадает.
+    """
+
+    def __init__(self):
+        self.series: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._versions: defaultdict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(
+        self,
+        cb_codes: list[str],
+        loader: Callable[[list[str]], Awaitable[list[tuple[str, date | str, float]]]],
+    ) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        """
+        Получить курсы валют, прочитав отсутствующие в индексе
+        :param cb_codes: Коды валют ЦБ РФ
+        :param loader: Чтение курсов (cb_code, date, unit_rate) по кодам валют
+        :return: Даты datetime64[D] и курсы по возрастанию даты по кодам валют,
+            коды без котировок с пустыми массивами
+        """
+        series = {cb_code: self.series.get(cb_code) for cb_code in cb_codes}
+        missing = [cb_code for cb_code, item in series.items() if item is None]
+        self.hits += len(cb_codes) - len(missing)
+        if not missing:
+            return series
+
+        self.misses += len(missing)
+        versions = {cb_code: self._versions[cb_code] for cb_code in missing}
+        rows = defaultdict(list)
+        for cb_code, rate_date, unit_rate in await loader(missing):
+            rows[cb_code].append((rate_date, unit_rate))
+
+        for cb_code in missing:
+            dates, rates = zip(*rows[cb_code]) if rows[cb_code] else ((), ())
+            dates = np.array(dates, dtype="datetime64[D]")
+            rates = np.array(rates, dtype=np.float64)
+            order = np.argsort(dates, kind="stable")
+            series[cb_code] = (dates[order], rates[order])
+            if self._versions[cb_code] == versions[cb_code]:
+                self.series[cb_code] = series[cb_code]
+        return series
+
+    def invalidate(self, cb_codes: Iterable[str]) -> None:
+        for cb_code in cb_codes:
+            self._versions[cb_code] += 1
+            self.series.pop(cb_code, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self.series), "hits": self.hits, "misses": self.misses}
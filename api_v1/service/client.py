@@ -0,0 +1,29 @@
+from typing import Annotated
+
+import aiohttp
+from fastapi import Depends, Request
+
+from core.config import settings
+
+
+def create_client_session() -> aiohttp.ClientSession:
+    """Общая на всё приложение сессия aiohttp с пулом keep-alive соединений к ЦБ РФ"""
+    connector = aiohttp.TCPConnector(
+        limit=settings.cbr.CBR_LIMIT,
+        limit_per_host=settings.cbr.CBR_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.cbr.CBR_DNS_TTL,
+        keepalive_timeout=settings.cbr.CBR_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.cbr.CBR_TIMEOUT,
+        connect=settings.cbr.CBR_CONNECT_TIMEOUT,
+        sock_read=settings.cbr.CBR_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def get_client_session(request: Request) -> aiohttp.ClientSession:
+    return request.app.state.client_session
+
+
+ClientSessionDep = Annotated[aiohttp.ClientSession, Depends(get_client_session)]
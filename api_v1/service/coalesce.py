@@ -0,0 +1,76 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from yarl import URL
+
+
+def normalize_url(url: str) -> str:
+    """Привести URL к единому виду: регистр хоста и порядок параметров запроса"""
+    url = URL(url)
+    return str(url.with_query(sorted(url.query.items())))
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов.
+
+    Пока запрос по ключу выполняется, остальные вызовы с тем же ключом ожидают
+    его результат вместо повторного обращения к источнику. Результат общий для
+    всех ожидающих и не должен изменяться вызывающим кодом. Запрос отменяется,
+    когда отменены все ожидающие его вызовы.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнить func или присоединиться к уже выполняющемуся вызову
+        :param key: Ключ запроса
+        :param func: Фабрика корутины, выполняющей запрос
+        :return: Результат запроса
+        """
+        self.requests += 1
+
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            call.add_done_callback(lambda done: self._forget(key, done))
+            self._calls[key] = call
+        else:
+            self.coalesced += 1
+
+        self._waiters[call] = self._waiters.get(call, 0) + 1
+        try:
+            # Отмена одного из ожидающих не должна прерывать запрос для остальных
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # Последний ожидающий отменён: результат никому не нужен, запрос
+            # освобождает лимиты и не повторяется
+            if self._waiters[call] == 1 and not call.done():
+                call.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            self._waiters[call] -= 1
+            if not self._waiters[call]:
+                del self._waiters[call]
+
+    def _forget(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            call.exception()  # Ошибка уже получена ожидающими, не логируем её повторно
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "in_flight": len(self._calls),
+        }
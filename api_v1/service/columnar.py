@@ -0,0 +1,161 @@
+"""Котировки из хранилища в столбцах Arrow и их запись в Parquet или Arrow IPC"""
+
+from collections.abc import AsyncIterator
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.db.models.models import ExchangeRate
+from api_v1.db.session import async_session_factory
+from core.config import settings
+
+# Форматы выгрузки и их типы содержимого
+EXPORT_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+_table = ExchangeRate.__table__
+_decimal = pa.decimal128(_table.c.value.type.precision, _table.c.value.type.scale)
+_code = pa.dictionary(pa.int32(), pa.string())
+
+EXPORT_SCHEMA = pa.schema(
+    [
+        pa.field("date", pa.date32(), nullable=False),
+        pa.field("cb_code", _code, nullable=False),
+        pa.field("iso_code", _code),
+        pa.field("nominal", pa.int32()),
+        pa.field("value", _decimal),
+        pa.field("unit_rate", _decimal),
+    ]
+)
+
+
+class ChunkBuffer:
+    """Файл для записи pyarrow, отдающий записанные байты частями"""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def to_record_batch(rows: list) -> pa.RecordBatch:
+    """Строки (date, cb_code, iso_code, nominal, value, unit_rate) в пакет столбцов"""
+    columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_SCHEMA]
+    return pa.record_batch(
+        [
+            (
+                pa.array(column, type=field.type.value_type).dictionary_encode()
+                if pa.types.is_dictionary(field.type)
+                else pa.array(column, type=field.type)
+            )
+            for column, field in zip(columns, EXPORT_SCHEMA)
+        ],
+        schema=EXPORT_SCHEMA,
+    )
+
+
+async def iter_export_batches(
+    session: AsyncSession,
+    cb_codes: list[str] | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    batch_size: int = settings.cbr.CBR_EXPORT_BATCH_SIZE,
+) -> AsyncIterator[pa.RecordBatch]:
+    """
+    Котировки из хранилища пакетами столбцов, упорядоченные по дате и коду валюты.
+    Пакет не пересекает границу года, поэтому группы строк Parquet и пакеты
+    Arrow разбиты по годам. Строки читаются курсором без ORM объектов.
+
+    :param session: Сессия базы данных
+    :param cb_codes: (Optional) Коды валют ЦБ РФ, по умолчанию все
+    :param date_from: (Optional) Начало периода
+    :param date_to: (Optional) Конец периода
+    :param batch_size: (Optional) Максимальное число строк в пакете
+    """
+    query = select(
+        _table.c.date,
+        _table.c.cb_code,
+        _table.c.iso_code,
+        _table.c.nominal,
+        _table.c.value,
+        _table.c.unit_rate,
+    ).order_by(_table.c.date, _table.c.cb_code)
+    if cb_codes:
+        query = query.where(_table.c.cb_code.in_(cb_codes))
+    if date_from:
+        query = query.where(_table.c.date >= date_from)
+    if date_to:
+        query = query.where(_table.c.date <= date_to)
+
+    connection = await session.connection()
+    result = await connection.stream(query)
+
+    rows, year = [], None
+    async for partition in result.partitions(batch_size):
+        for row in partition:
+            if rows and (row[0].year != year or len(rows) >= batch_size):
+                yield to_record_batch(rows)
+                rows = []
+            rows.append(row)
+            year = row[0].year
+
+    if rows:
+        yield to_record_batch(rows)
+
+
+def open_writer(
+    sink, export_format: str
+) -> pq.ParquetWriter | pa.ipc.RecordBatchStreamWriter:
+    if export_format == "parquet":
+        return pq.ParquetWriter(
+            sink,
+            EXPORT_SCHEMA,
+            compression="zstd",
+            use_dictionary=["cb_code", "iso_code"],
+        )
+    # Формат потока Arrow допускает разные словари кодов в разных пакетах
+    return pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+
+
+async def stream_export(
+    cb_codes: list[str] | None,
+    date_from: date | None,
+    date_to: date | None,
+    export_format: str,
+) -> AsyncIterator[bytes]:
+    """Файл выгрузки частями по мере чтения котировок из хранилища"""
+    buffer = ChunkBuffer()
+    writer = open_writer(pa.PythonFile(buffer, mode="w"), export_format)
+
+    # Сессия зависимости закрывается до отправки ответа, поэтому открываем свою
+    async with async_session_factory() as session:
+        async for batch in iter_export_batches(session, cb_codes, date_from, date_to):
+            writer.write_batch(batch)
+            yield buffer.take()
+
+    writer.close()
+    yield buffer.take()
@@ -0,0 +1,99 @@
+"""
+Выгрузка истории курсов валют из хранилища в Parquet или Arrow IPC.
+
+Запуск:
+    python -m api_v1.service.export --format parquet --output rates.parquet
+    python -m api_v1.service.export --output rates --partitioned --codes R01235
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date
+
+from api_v1.db.session import async_engine, async_session_factory
+from api_v1.service.columnar import EXPORT_FORMATS, iter_export_batches, open_writer
+
+
+async def export_exchange_rates(
+    output: str,
+    export_format: str = "parquet",
+    cb_codes: list[str] | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    partitioned: bool = False,
+) -> int:
+    """
+    Записать котировки из хранилища в файл или, если partitioned,
+    в каталог с разделами по годам `year=YYYY/part-0.<format>`.
+
+    :return: Число выгруженных строк
+    """
+    rows = 0
+    writer, writer_year = None, None
+    async with async_session_factory() as session:
+        async for batch in iter_export_batches(session, cb_codes, date_from, date_to):
+            year = batch.column("date")[0].as_py().year
+            if writer is None or (partitioned and year != writer_year):
+                if writer is not None:
+                    writer.close()
+                writer, writer_year = open_file(
+                    output, export_format, year, partitioned
+                )
+
+            writer.write_batch(batch)
+            rows += batch.num_rows
+
+    # Пустая выгрузка в файл всё равно содержит схему
+    if writer is None and not partitioned:
+        writer, _ = open_file(output, export_format, None, partitioned)
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def open_file(
+    output: str, export_format: str, year: int | None, partitioned: bool
+) -> tuple:
+    path = output
+    if partitioned:
+        directory = os.path.join(output, f"year={year}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-0.{export_format}")
+    return open_writer(path, export_format), year
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        rows = await export_exchange_rates(
+            args.output,
+            export_format=args.format,
+            cb_codes=args.codes,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            partitioned=args.partitioned,
+        )
+        logging.info("Export: %s rows to %s", rows, args.output)
+    finally:
+        await async_engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Выгрузка истории курсов валют в Parquet или Arrow"
+    )
+    parser.add_argument("--output", required=True, help="Файл или каталог выгрузки")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--date-from", type=date.fromisoformat, default=None)
+    parser.add_argument("--date-to", type=date.fromisoformat, default=None)
+    parser.add_argument("--codes", nargs="+", default=None, help="Коды валют ЦБ РФ")
+    parser.add_argument(
+        "--partitioned", action="store_true", help="Каталог с разделами по годам"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,228 @@
+"""
+Загрузка истории курсов валют ЦБ РФ в таблицу курсов валют.
+
+Запуск:
+    python -m api_v1.service.ingest --date-from 2004-01-01 --codes R01235 R01239
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import aiohttp
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.db.crud import async_create_db
+from api_v1.db.session import async_engine, async_session_factory
+from api_v1.service.client import create_client_session
+from api_v1.service.service import (
+    currency_directory,
+    dynamics_url,
+    fetch_currency_data,
+    split_range,
+    tz,
+)
+from api_v1.service.store import add_coverage, prune_rates, upsert_rates
+from core.config import settings
+
+# Коды валют ЦБ РФ, загружаемые по умолчанию
+DEFAULT_CB_CODES = [
+    "R01239",  # EUR
+    "R01235",  # USD
+    "R01375",  # CNY
+    "R01700J",  # TRY Турецкая лира
+    # СНГ
+    "R01060",  # AMD Армянский драм
+    "R01090",  # BYR Белорусский рубль
+    "R01335",  # KZT Казахстанский тенге
+    "R01370",  # KGS Киргизский сом
+    "R01670",  # TJS Таджикский сомони
+    "R01717",  # UZS Узбекский сум
+    "R01720",  # UAH Украинская гривна
+    "R01020A",  # AZN Азербайджанский манат
+    "R01210",  # GEL Грузинский лари
+]
+
+DEFAULT_DATE_FROM = date(2004, 1, 1)
+
+
+@dataclass
+class IngestProgress:
+    windows: int
+    windows_done: int = 0
+    windows_failed: int = 0
+    rows: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+async def ingest_exchange_rates(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    date_from: date = DEFAULT_DATE_FROM,
+    date_to: date | None = None,
+    cb_codes: list[str] | None = None,
+    batch_size: int = settings.cbr.CBR_INGEST_BATCH_SIZE,
+    progress: Callable[[IngestProgress], None] | None = None,
+) -> IngestProgress:
+    """
+    Загрузить котировки за период по окнам и записать их пакетами.
+
+    Окна загружаются параллельно в пределах общих лимитов обращений к ЦБ РФ,
+    очередь между загрузкой и записью ограничена, поэтому в памяти находится
+    не больше нескольких окон и одного пакета. Каждый пакет записывается
+    upsert по индексу (cb_code, date) и фиксируется отдельной транзакцией,
+    таблица не очищается.
+
+    :param session: Сессия базы данных
+    :param client: Сессия aiohttp для обращения к ЦБ РФ
+    :param date_from: (Optional) Начало периода
+    :param date_to: (Optional) Конец периода, по умолчанию текущая дата
+    :param cb_codes: (Optional) Коды валют ЦБ РФ, по умолчанию DEFAULT_CB_CODES
+    :param batch_size: (Optional) Число строк в пакете записи
+    :param progress: (Optional) Вызывается после обработки каждого окна
+    :return: Итоги загрузки
+    """
+    today = datetime.now(tz=tz).date()
+    date_to = date_to or today
+    cb_codes = cb_codes or DEFAULT_CB_CODES
+
+    currency_json = (await currency_directory.get(client)).by_cb_code
+    windows = [
+        (cb_code, window_from, window_to)
+        for cb_code in cb_codes
+        for window_from, window_to in split_range(date_from, date_to)
+    ]
+    state = IngestProgress(windows=len(windows))
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.cbr.CBR_MAX_CONCURRENCY)
+    pending = iter(windows)
+
+    async def fetch_worker():
+        for cb_code, window_from, window_to in pending:
+            try:
+                records = await fetch_currency_data(
+                    client, dynamics_url(cb_code, window_from, window_to)
+                )
+            except Exception as e:
+                # Окно считается незагруженным, остальные продолжают загружаться
+                logging.error("Ingest fetch error: %s", e, exc_info=True)
+                records = None
+            await queue.put((cb_code, window_from, window_to, records))
+
+    workers = [
+        asyncio.create_task(fetch_worker())
+        for _ in range(settings.cbr.CBR_MAX_CONCURRENCY)
+    ]
+
+    batch, batch_rows = [], 0
+    try:
+        for _ in range(len(windows)):
+            cb_code, window_from, window_to, records = await queue.get()
+            state.windows_done += 1
+
+            if records is None:
+                state.windows_failed += 1
+                logging.warning(
+                    "Ingest failed: %s %s - %s", cb_code, window_from, window_to
+                )
+            else:
+                batch.append((cb_code, window_from, window_to, records))
+                batch_rows += len(records)
+
+            if batch and (
+                batch_rows >= batch_size or state.windows_done == state.windows
+            ):
+                state.rows += await write_batch(session, batch, currency_json, today)
+                batch, batch_rows = [], 0
+
+            if progress:
+                progress(state)
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+    return state
+
+
+async def write_batch(
+    session: AsyncSession, batch: list[tuple], currency_json: dict, today: date
+) -> int:
+    rows = [
+        {**record, "iso_code": (currency_json.get(cb_code) or {}).get("iso_code")}
+        for cb_code, _, _, records in batch
+        for record in records
+    ]
+    # Весь пакет записывается одним upsert, неизменившиеся строки не обновляются
+    await upsert_rates(session, rows)
+
+    for cb_code, window_from, window_to, records in batch:
+        await prune_rates(session, cb_code, window_from, window_to, records)
+        if window_from <= today:
+            await add_coverage(session, cb_code, window_from, min(window_to, today))
+
+    await session.commit()
+    return len(rows)
+
+
+def log_progress(state: IngestProgress) -> None:
+    logging.info(
+        "Ingest: %s/%s windows, %s failed, %s rows, %.1f s",
+        state.windows_done,
+        state.windows,
+        state.windows_failed,
+        state.rows,
+        state.elapsed,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    await async_create_db()
+    client = create_client_session()
+    try:
+        cb_codes = args.codes
+        if args.all:
+            cb_codes = list((await currency_directory.get(client)).by_cb_code)
+
+        async with async_session_factory() as session:
+            state = await ingest_exchange_rates(
+                session,
+                client,
+                date_from=args.date_from,
+                date_to=args.date_to,
+                cb_codes=cb_codes,
+                batch_size=args.batch_size,
+                progress=log_progress,
+            )
+        log_progress(state)
+    finally:
+        await client.close()
+        await async_engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Загрузка истории курсов валют ЦБ РФ")
+    parser.add_argument(
+        "--date-from", type=date.fromisoformat, default=DEFAULT_DATE_FROM
+    )
+    parser.add_argument("--date-to", type=date.fromisoformat, default=None)
+    parser.add_argument("--codes", nargs="+", default=None, help="Коды валют ЦБ РФ")
+    parser.add_argument(
+        "--all", action="store_true", help="Все коды валют из справочника ЦБ РФ"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.cbr.CBR_INGEST_BATCH_SIZE
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Ограничение частоты операций алгоритмом token bucket"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        :param rate: Число операций в секунду
+        :param burst: Допустимое число операций подряд без ожидания
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Под блокировкой ожидающие получают токены строго по очереди
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class UpstreamLimiter:
+    """
+    Общее на процесс ограничение обращений к ЦБ РФ: не больше max_concurrency
+    одновременных запросов и не чаще rate запросов в секунду.
+    """
+
+    def __init__(self, max_concurrency: int, rate: float = 0, burst: int = 1):
+        """
+        :param max_concurrency: Число одновременных запросов
+        :param rate: (Optional) Число запросов в секунду, 0 - без ограничения
+        :param burst: (Optional) Допустимое число запросов подряд без ожидания
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+
+        self.waiting = 0
+        self.active = 0
+        self.acquired = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def __aenter__(self) -> "UpstreamLimiter":
+        started_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                if self._bucket:
+                    await self._bucket.acquire()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        wait_time = time.perf_counter() - started_at
+        self.acquired += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+        self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "wait_time_total": round(self.wait_time_total, 6),
+            "wait_time_avg": (
+                round(self.wait_time_total / self.acquired, 6) if self.acquired else 0
+            ),
+            "wait_time_max": round(self.wait_time_max, 6),
+        }
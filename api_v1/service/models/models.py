@@ -1,3 +1,5 @@
+from datetime import date
+
 from models.base import Model
 
 
@@ -24,6 +26,8 @@ class ExchangeRateModel(Model):
     nominal: int | None
     value: str | None
     unit_rate: str | None
+    value_num: float | None = None
+    unit_rate_num: float | None = None
 
 
 class TotalExchangeRateModel(Model):
@@ -31,6 +35,57 @@ class TotalExchangeRateModel(Model):
     items: list[ExchangeRateModel]
 
 
+class CrossRateModel(Model):
+    date: str
+    pair: str
+    rate: float
+
+
+class TotalCrossRateModel(Model):
+    total: int
+    items: list[CrossRateModel]
+
+
+class OHLCModel(Model):
+    date: str
+    iso_code: str
+    open: float
+    high: float
+    low: float
+    close: float
+    mean: float
+    count: int
+
+
+class TotalOHLCModel(Model):
+    total: int
+    items: list[OHLCModel]
+
+
+class ConversionItemModel(Model):
+    amount: float
+    currency: str
+    date: date
+
+
+class ConversionRequestModel(Model):
+    items: list[ConversionItemModel]
+
+
+class ConversionModel(Model):
+    amount: float
+    currency: str
+    date: str
+    rate_date: str | None
+    rate: float | None
+    amount_rub: float | None
+
+
+class TotalConversionModel(Model):
+    total: int
+    items: list[ConversionModel]
+
+
 class CBCodesRequestModel(Model):
     # date_from: str | None
     # date_to: str | None
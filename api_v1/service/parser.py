@@ -0,0 +1,91 @@
+import time
+import xml.etree.ElementTree as ET
+from collections.abc import AsyncIterator, Callable, Iterable
+from decimal import Decimal
+from typing import Any
+
+import aiohttp
+
+from core.metrics import xml_parse_seconds, xml_rows
+
+CHUNK_SIZE = 64 * 1024
+
+RowParser = Callable[[ET.Element, ET.Element], Any]
+
+DECIMAL_PLACES = Decimal("0.0001")
+
+
+def parse_decimal(text: str | None) -> Decimal | None:
+    """Число в формате ЦБ РФ с десятичной запятой: "92,5153" """
+    return Decimal(text.replace(",", ".")) if text else None
+
+
+def format_decimal(value: Decimal | None) -> str | None:
+    """Число в формате ЦБ РФ: десятичная запятая и не менее четырёх знаков"""
+    if value is None:
+        return None
+
+    value = value.normalize()
+    if value.as_tuple().exponent > -4:
+        value = value.quantize(DECIMAL_PLACES)
+    return f"{value:f}".replace(".", ",")
+
+
+async def iter_rows(
+    content: aiohttp.StreamReader,
+    tag: str,
+    parse: RowParser,
+    chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[Any]:
+    """
+    Потоковый разбор XML ответа ЦБ РФ.
+
+    Части ответа передаются инкрементальному парсеру по мере получения, строка
+    возвращается сразу после закрытия элемента tag, после чего элемент удаляется
+    из дерева. Ни весь ответ, ни всё дерево в памяти не хранятся.
+
+    :param content: Тело ответа aiohttp
+    :param tag: Тег строки, дочерний для корневого элемента (Record, Valute, Item)
+    :param parse: Разбор строки, получает элемент строки и корневой элемент
+    :param chunk_size: (Optional) Размер читаемой части ответа, байт
+    :return: Асинхронный итератор разобранных строк
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    state = {"root": None}
+    parse_time, rows_count = 0.0, 0
+
+    async for chunk in content.iter_chunked(chunk_size):
+        # Учитывается только время разбора, без ожидания сети и потребителя строк
+        started_at = time.perf_counter()
+        parser.feed(chunk)
+        rows = list(_read_rows(parser.read_events(), tag, parse, state))
+        parse_time += time.perf_counter() - started_at
+        rows_count += len(rows)
+        for row in rows:
+            yield row
+
+    started_at = time.perf_counter()
+    parser.close()
+    rows = list(_read_rows(parser.read_events(), tag, parse, state))
+    parse_time += time.perf_counter() - started_at
+    rows_count += len(rows)
+
+    xml_parse_seconds.observe(parse_time, tag)
+    xml_rows.inc(tag, amount=rows_count)
+    for row in rows:
+        yield row
+
+
+def _read_rows(
+    events: Iterable[tuple[str, ET.Element]], tag: str, parse: RowParser, state: dict
+) -> Iterable[Any]:
+    for event, element in events:
+        if event == "start":
+            # Атрибуты корневого элемента (например, дата котировок) нужны строкам
+            if state["root"] is None:
+                state["root"] = element
+            continue
+
+        if element.tag == tag:
+            yield parse(element, state["root"])
+            state["root"].remove(element)
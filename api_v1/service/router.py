@@ -1,29 +1,155 @@
 from typing import Annotated, Union
-from datetime import datetime
+from datetime import date as date_type, datetime
 import pytz
 
+import orjson
 from fastapi import (
     APIRouter,
     Query,
+    Header,
     HTTPException,
     status,
     Body,
 )
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 
-
+from api_v1.db.session import SessionDep, async_session_factory
+from api_v1.service.client import ClientSessionDep
+from core.compression import CompressedBody, negotiate
+from core.conditional import Validators, cache_control, last_modified, make_etag
+from core.config import settings
 from core.dependencies import TokenDep
 from .models.models import (
     TotalExchangeRateModel,
     TotalCurrencyCodeModel,
+    TotalCrossRateModel,
+    TotalOHLCModel,
+    TotalConversionModel,
+    ConversionRequestModel,
     CBCodesRequestModel,
 )
-from .service import currency_codes, exchange_rates_daly, exchange_rates_dynamics
+from .analytics import PERIODS, exchange_convert, exchange_cross_rates, exchange_ohlc
+from .columnar import EXPORT_FORMATS, stream_export
+from .service import (
+    MIN_DATE,
+    currency_directory,
+    exchange_rates_daly,
+    exchange_rates_dynamics,
+    is_stored,
+    iter_exchange_rates_dynamics,
+    response_cache,
+    validator_cache,
+)
 
 router = APIRouter()
 
 timezone = "Europe/Moscow"
 tz = pytz.timezone(timezone)
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def parse_date(value: str) -> date_type:
+    return datetime.fromisoformat(value).date()
+
+
+def json_response(content: dict) -> Response:
+    """
+    Ответ, сериализованный один раз через orjson. Строки котировок и справочника
+    уже содержат поля модели ответа: response_model описывает схему OpenAPI,
+    но каждая строка повторно не проверяется
+    """
+    return ORJSONResponse(content)
+
+
+def cache_body(
+    key: tuple, body: bytes, validators: Validators | None = None
+) -> CompressedBody | None:
+    """
+    Сохранить сериализованный ответ на неизменяемых данных вместе с валидаторами,
+    сжатые варианты добавляются при первых запросах. Тела больше
+    HTTP_RESPONSE_CACHE_MAX_BODY не кэшируются и сжимаются middleware
+    """
+    if len(body) > settings.http.HTTP_RESPONSE_CACHE_MAX_BODY:
+        return None
+    cached = CompressedBody(body, "application/json")
+    response_cache.set(key, (cached, validators))
+    return cached
+
+
+async def compressed_response(
+    key: tuple,
+    cached: CompressedBody,
+    validators: Validators | None,
+    accept_encoding: str | None,
+) -> Response:
+    if not settings.http.HTTP_COMPRESSION:
+        accept_encoding = None
+    response = await cached.response(
+        accept_encoding, settings.http.HTTP_COMPRESSION_MIN_SIZE
+    )
+    # Новый сжатый вариант увеличивает объём записи в кэше
+    response_cache.reweigh(key)
+    if validators is not None:
+        response.headers.update(
+            validators.headers(response.headers.get("content-encoding"))
+        )
+    return response
+
+
+def response_encoding(accept_encoding: str | None, size: int) -> str | None:
+    """Кодировка, в которой был бы отдан ответ: для ETag ответа 304"""
+    if not settings.http.HTTP_COMPRESSION:
+        return None
+    if size < settings.http.HTTP_COMPRESSION_MIN_SIZE:
+        return None
+    return negotiate(accept_encoding)
+
+
+def not_modified(validators: Validators, accept_encoding: str | None) -> Response:
+    return validators.not_modified(response_encoding(accept_encoding, validators.size))
+
+
+def daily_validators(rate_date: str, body: bytes, immutable: bool) -> Validators:
+    """
+    ETag по дате и содержимому котировок, Last-Modified - дата установления
+    курсов. Курсы на завтра публикуются заранее: для них Last-Modified -
+    время, когда это содержимое получено впервые, и между запросами оно
+    не сдвигается
+    """
+    etag = make_etag(rate_date, body)
+    published = tz.localize(datetime.strptime(rate_date, "%Y-%m-%d"))
+    if immutable:
+        modified = last_modified(published)
+        max_age = settings.http.HTTP_IMMUTABLE_MAX_AGE
+    else:
+        modified = validator_cache.get(("last-modified", etag))
+        if modified is None:
+            modified = last_modified(published)
+            validator_cache.set(("last-modified", etag), modified)
+        max_age = settings.http.HTTP_MAX_AGE
+
+    return Validators(
+        etag=etag,
+        cache_control=cache_control(max_age, immutable),
+        last_modified=modified,
+        size=len(body),
+    )
+
+
+async def stream_exchange_rates_dynamics(client, date_from, date_to, cb_codes):
+    # Сессия зависимости закрывается до отправки ответа, поэтому открываем свою
+    async with async_session_factory() as session:
+        total = 0
+        async for rows in iter_exchange_rates_dynamics(
+            session, client, date_from, date_to, cb_codes
+        ):
+            total += len(rows)
+            if rows:
+                yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+        yield orjson.dumps({"total": total}) + b"\n"
+
 
 @router.get(
     "/code-reference",
@@ -33,16 +159,41 @@ tz = pytz.timezone(timezone)
     response_model=TotalCurrencyCodeModel,
     dependencies=[TokenDep],
 )
-async def get_code_reference():
+async def get_code_reference(
+    client: ClientSessionDep,
+    accept_encoding: Annotated[
+        Union[str, None], Header(include_in_schema=False)
+    ] = None,
+    if_none_match: Annotated[Union[str, None], Header(include_in_schema=False)] = None,
+    if_modified_since: Annotated[
+        Union[str, None], Header(include_in_schema=False)
+    ] = None,
+):
 
-    result = await currency_codes()
+    # Валидаторы действуют, пока в памяти та же версия справочника
+    validators = validator_cache.get(("code-reference", currency_directory.updated_at))
+    if validators is not None and validators.matches(if_none_match, if_modified_since):
+        return not_modified(validators, accept_encoding)
+
+    result = (await currency_directory.get(client)).items
     if not result:
         raise HTTPException(
             status_code=status.HTTP_204_NO_CONTENT,
             detail="Not content",
         )
 
-    return {"total": len(result), "items": result}
+    body = orjson.dumps({"total": len(result), "items": result})
+    validators = Validators(
+        etag=make_etag("codes", body),
+        cache_control=cache_control(settings.http.HTTP_MAX_AGE),
+        size=len(body),
+    )
+    validator_cache.set(("code-reference", currency_directory.updated_at), validators)
+    if validators.matches(if_none_match, if_modified_since):
+        return not_modified(validators, accept_encoding)
+
+    # ETag сжатого варианта выставляет CompressionMiddleware
+    return Response(body, media_type="application/json", headers=validators.headers())
 
 
 @router.get(
@@ -54,6 +205,7 @@ async def get_code_reference():
     dependencies=[TokenDep],
 )
 async def get_exchange_rates_daly(
+    client: ClientSessionDep,
     date: Annotated[
         Union[str, None],
         Query(
@@ -77,6 +229,13 @@ async def get_exchange_rates_daly(
             description="ISO код валюты",
         ),
     ] = None,
+    accept_encoding: Annotated[
+        Union[str, None], Header(include_in_schema=False)
+    ] = None,
+    if_none_match: Annotated[Union[str, None], Header(include_in_schema=False)] = None,
+    if_modified_since: Annotated[
+        Union[str, None], Header(include_in_schema=False)
+    ] = None,
 ):
 
     if date:
@@ -86,7 +245,20 @@ async def get_exchange_rates_daly(
                 detail="Date error: date > current date.",
             )
 
-    result = await exchange_rates_daly(date, currency_iso_code)
+    # Котировки на прошедшую дату не изменяются
+    rate_date = parse_date(date) if date else None
+    immutable = rate_date is not None and rate_date < datetime.now(tz=tz).date()
+    key = ("daily", rate_date, currency_iso_code)
+
+    # Условный запрос проверяется до обращения к кэшам и ЦБ РФ
+    entry = response_cache.get(key) if immutable else None
+    validators = entry[1] if entry else validator_cache.get(key)
+    if validators is not None and validators.matches(if_none_match, if_modified_since):
+        return not_modified(validators, accept_encoding)
+    if entry:
+        return await compressed_response(key, *entry, accept_encoding)
+
+    result = await exchange_rates_daly(client, date, currency_iso_code)
 
     if not result:
         raise HTTPException(
@@ -94,7 +266,20 @@ async def get_exchange_rates_daly(
             detail="Not content",
         )
 
-    return {"total": len(result), "items": result}
+    body = orjson.dumps({"total": len(result), "items": result})
+    validators = daily_validators(result[0]["date"], body, immutable)
+    cached = None
+    if immutable:
+        cached = cache_body(key, body, validators)
+    else:
+        validator_cache.set(key, validators, ttl=settings.http.HTTP_MAX_AGE)
+
+    if validators.matches(if_none_match, if_modified_since):
+        return not_modified(validators, accept_encoding)
+    if cached is not None:
+        return await compressed_response(key, cached, validators, accept_encoding)
+    # ETag сжатого варианта выставляет CompressionMiddleware
+    return Response(body, media_type="application/json", headers=validators.headers())
 
 
 @router.post(
@@ -103,6 +288,7 @@ async def get_exchange_rates_daly(
     status_code=status.HTTP_200_OK,
     summary="Получить динамику котировок по кодам валют ЦБ РФ",
     response_model=TotalExchangeRateModel,
+    responses={status.HTTP_200_OK: {"content": {NDJSON_MEDIA_TYPE: {}}}},
     dependencies=[TokenDep],
 )
 async def get_exchange_rates_dynamics(
@@ -126,6 +312,8 @@ async def get_exchange_rates_dynamics(
             max_items=15,
         ),
     ],
+    session: SessionDep,
+    client: ClientSessionDep,
     date_from: Annotated[
         Union[str, None],
         Query(
@@ -152,6 +340,19 @@ async def get_exchange_rates_dynamics(
             pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
         ),
     ] = None,
+    stream: Annotated[
+        bool,
+        Query(
+            alias="stream",
+            description="Построчная выдача в формате NDJSON по мере загрузки котировок. "
+            "Также включается заголовком `Accept: application/x-ndjson`. "
+            "Последняя строка содержит только `total`.",
+        ),
+    ] = False,
+    accept: Annotated[Union[str, None], Header(include_in_schema=False)] = None,
+    accept_encoding: Annotated[
+        Union[str, None], Header(include_in_schema=False)
+    ] = None,
 ):
 
     if date_from and not date_to:
@@ -171,12 +372,134 @@ async def get_exchange_rates_dynamics(
                 detail="Date error: date_from > date_to.",
             )
 
+    if stream or (accept and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse(
+            stream_exchange_rates_dynamics(
+                client,
+                date_from,
+                date_to,
+                request.cb_codes if request else None,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    # Закрытый период в прошлом, загруженный в хранилище, не изменяется
+    key = None
+    if request and request.cb_codes and date_to:
+        start_date = parse_date(date_from) if date_from else MIN_DATE
+        end_date = parse_date(date_to)
+        if end_date < datetime.now(tz=tz).date():
+            key = ("dynamics", start_date, end_date, tuple(request.cb_codes))
+            if (entry := response_cache.get(key)) is not None:
+                return await compressed_response(key, *entry, accept_encoding)
+
     result = await exchange_rates_dynamics(
+        session,
+        client,
         date_from,
         date_to,
         request.cb_codes if request else None,
     )
 
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_204_NO_CONTENT,
+            detail="Not content",
+        )
+
+    content = {"total": len(result), "items": result}
+    # Период загружен не полностью, например при ошибке ЦБ РФ: не кэшируем
+    if key is None or not await is_stored(
+        session, client, request.cb_codes, start_date, end_date
+    ):
+        return json_response(content)
+
+    body = orjson.dumps(content)
+    cached = cache_body(key, body)
+    if cached is None:
+        return Response(body, media_type="application/json")
+    return await compressed_response(key, cached, None, accept_encoding)
+
+
+@router.get(
+    "/exchange-rates/cross",
+    tags=["Exchange"],
+    status_code=status.HTTP_200_OK,
+    summary="Получить кросс-курсы валют за период",
+    response_model=TotalCrossRateModel,
+    dependencies=[TokenDep],
+)
+async def get_exchange_cross_rates(
+    session: SessionDep,
+    client: ClientSessionDep,
+    pairs: Annotated[
+        list[str],
+        Query(
+            alias="pairs",
+            title="Array of string",
+            examples=[["EUR/CNY", "USD/KZT"]],
+            description="Пары ISO кодов валют `BASE/QUOTE`: цена единицы BASE в QUOTE. "
+            "Курс рубля (RUB) равен 1. "
+            "Максимальное кол-во: 15.",
+            min_length=1,
+            max_length=15,
+        ),
+    ],
+    date_from: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_from",
+            title="string",
+            examples=["2024-01-01"],
+            description="Дата в формате `RFC3339` с ... "
+            "По умолчанию: 1992-07-01. "
+            "Минимальная дата: 1992-07-01.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+    date_to: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_to",
+            title="string",
+            examples=["2024-01-31"],
+            description="Дата в формате `RFC3339` по ... "
+            "По умолчанию: текущая дата. "
+            "Минимальная дата: 1992-07-01.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+):
+
+    if date_from and date_to:
+        if (
+            datetime.strptime(date_from, "%Y-%m-%d").date()
+            > datetime.strptime(date_to, "%Y-%m-%d").date()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Date error: date_from > date_to.",
+            )
+
+    currency_pairs = []
+    for pair in pairs:
+        base, _, quote = pair.upper().partition("/")
+        if not base or not quote:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Pair error: {pair}, expected BASE/QUOTE.",
+            )
+        currency_pairs.append((base, quote))
+
+    try:
+        result = await exchange_cross_rates(
+            session, client, currency_pairs, date_from, date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     if not result:
         raise HTTPException(
             status_code=status.HTTP_204_NO_CONTENT,
@@ -184,3 +507,246 @@ async def get_exchange_rates_dynamics(
         )
 
     return {"total": len(result), "items": result}
+
+
+@router.get(
+    "/exchange-rates/ohlc",
+    tags=["Exchange"],
+    status_code=status.HTTP_200_OK,
+    summary="Получить курсы валют по периодам: открытие, максимум, минимум, закрытие, среднее",
+    response_model=TotalOHLCModel,
+    dependencies=[TokenDep],
+)
+async def get_exchange_ohlc(
+    session: SessionDep,
+    client: ClientSessionDep,
+    currencies: Annotated[
+        list[str],
+        Query(
+            alias="currencies",
+            title="Array of string",
+            examples=[["USD", "EUR"]],
+            description="ISO коды валют. Значения - курс за единицу валюты. "
+            "Максимальное кол-во: 15.",
+            min_length=1,
+            max_length=15,
+        ),
+    ],
+    period: Annotated[
+        str,
+        Query(
+            alias="period",
+            title="string",
+            examples=["month"],
+            description="Календарный период: "
+            f"{', '.join(f'`{name}`' for name in PERIODS)}. "
+            "Дата в ответе - начало периода.",
+            pattern=f"^({'|'.join(PERIODS)})$",
+        ),
+    ] = "month",
+    date_from: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_from",
+            title="string",
+            examples=["2024-01-01"],
+            description="Дата в формате `RFC3339` с ... "
+            "По умолчанию: 1992-07-01. "
+            "Минимальная дата: 1992-07-01.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+    date_to: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_to",
+            title="string",
+            examples=["2024-12-31"],
+            description="Дата в формате `RFC3339` по ... "
+            "По умолчанию: текущая дата. "
+            "Минимальная дата: 1992-07-01.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+):
+
+    if date_from and date_to:
+        if (
+            datetime.strptime(date_from, "%Y-%m-%d").date()
+            > datetime.strptime(date_to, "%Y-%m-%d").date()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Date error: date_from > date_to.",
+            )
+
+    try:
+        result = await exchange_ohlc(
+            session,
+            client,
+            [currency.upper() for currency in currencies],
+            period,
+            date_from,
+            date_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_204_NO_CONTENT,
+            detail="Not content",
+        )
+
+    return {"total": len(result), "items": result}
+
+
+@router.post(
+    "/exchange-rates/convert",
+    tags=["Exchange"],
+    status_code=status.HTTP_200_OK,
+    summary="Пересчитать суммы в рубли по курсу ЦБ РФ на дату каждой суммы",
+    response_model=TotalConversionModel,
+    dependencies=[TokenDep],
+)
+async def get_exchange_convert(
+    request: Annotated[
+        ConversionRequestModel,
+        Body(
+            title="Object",
+            examples=[
+                {
+                    "items": [
+                        {"amount": 100.5, "currency": "USD", "date": "2024-01-06"},
+                        {"amount": 2000, "currency": "CNY", "date": "2024-03-15"},
+                    ]
+                }
+            ],
+            description="Суммы в валюте с датой в формате `RFC3339`. "
+            "Используется последний курс на дату или ранее: "
+            "на выходные и праздники - курс предыдущего рабочего дня. "
+            "Курс рубля (RUB) равен 1. "
+            f"Максимальное кол-во: {settings.cbr.CBR_CONVERT_MAX_ITEMS}.",
+        ),
+    ],
+    session: SessionDep,
+    client: ClientSessionDep,
+):
+
+    if not request.items:
+        raise HTTPException(
+            status_code=status.HTTP_204_NO_CONTENT,
+            detail="Not content",
+        )
+
+    if len(request.items) > settings.cbr.CBR_CONVERT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Items error: more than {settings.cbr.CBR_CONVERT_MAX_ITEMS}.",
+        )
+
+    if max(item.date for item in request.items) > datetime.now(tz=tz).date():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date error: date > current date.",
+        )
+
+    try:
+        result = await exchange_convert(
+            session,
+            client,
+            [
+                {
+                    "amount": item.amount,
+                    "currency": item.currency.upper(),
+                    "date": item.date,
+                }
+                for item in request.items
+            ],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {"total": len(result), "items": result}
+
+
+@router.get(
+    "/exchange-rates/export",
+    tags=["Exchange"],
+    status_code=status.HTTP_200_OK,
+    summary="Выгрузить историю котировок из хранилища в Parquet или Arrow",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {media_type: {} for media_type in EXPORT_FORMATS.values()}
+        }
+    },
+    dependencies=[TokenDep],
+)
+async def get_exchange_rates_export(
+    export_format: Annotated[
+        str,
+        Query(
+            alias="format",
+            title="string",
+            examples=["parquet"],
+            description="Формат файла: "
+            f"{', '.join(f'`{name}`' for name in EXPORT_FORMATS)}. "
+            "Столбцы: date, cb_code, iso_code, nominal, value, unit_rate. "
+            "Коды валют в словарной кодировке, группы строк по годам.",
+            pattern=f"^({'|'.join(EXPORT_FORMATS)})$",
+        ),
+    ] = "parquet",
+    cb_codes: Annotated[
+        Union[list[str], None],
+        Query(
+            alias="cb_codes",
+            title="Array of string",
+            examples=[["R01239", "R01235"]],
+            description="Коды валют ЦБ РФ. По умолчанию: все загруженные.",
+        ),
+    ] = None,
+    date_from: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_from",
+            title="string",
+            examples=["2024-01-01"],
+            description="Дата в формате `RFC3339` с ... "
+            "По умолчанию: первая загруженная дата.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+    date_to: Annotated[
+        Union[str, None],
+        Query(
+            alias="date_to",
+            title="string",
+            examples=["2024-12-31"],
+            description="Дата в формате `RFC3339` по ... "
+            "По умолчанию: последняя загруженная дата.",
+            min_length=10,
+            pattern="^\\d{4}-\\d{2}-\\d{2}(T\\d{2}:\\d{2}:\\d{2}Z)?",
+        ),
+    ] = None,
+):
+
+    start_date = datetime.fromisoformat(date_from).date() if date_from else None
+    end_date = datetime.fromisoformat(date_to).date() if date_to else None
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date error: date_from > date_to.",
+        )
+
+    return StreamingResponse(
+        stream_export(cb_codes, start_date, end_date, export_format),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": "attachment; "
+            f'filename="exchange_rates.{export_format}"'
+        },
+    )
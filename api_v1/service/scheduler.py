@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+from datetime import date, datetime, time, timedelta
+
+import aiohttp
+
+from api_v1.db.session import async_session_factory
+from api_v1.service.parser import parse_decimal
+from api_v1.service.service import (
+    currency_directory,
+    daily_cache,
+    daily_url,
+    fetch_xml,
+    parse_daily_rate,
+    tz,
+)
+from api_v1.service.store import add_coverage, load_coverage, upsert_rates
+from core.config import settings
+
+
+class DailyRateScheduler:
+    """
+    Фоновая загрузка котировок ЦБ РФ на следующий день.
+
+    После времени публикации XML_daily.asp опрашивается с интервалом и случайной
+    добавкой, пока не появятся котировки на дату позже сегодняшней. Новые
+    котировки записываются в хранилище и кэш котировок на дату, справочник
+    кодов валют обновляется. После ошибок интервал опроса увеличивается.
+    """
+
+    def __init__(
+        self,
+        publish_time: time,
+        poll_window: float,
+        poll_interval: float,
+        jitter: float,
+        backoff_max: float,
+    ):
+        """
+        :param publish_time: Время публикации котировок, МСК
+        :param poll_window: Сколько опрашивать после времени публикации, сек.
+        :param poll_interval: Интервал опроса, сек.
+        :param jitter: Случайная добавка к интервалу, сек.
+        :param backoff_max: Максимальный интервал опроса после ошибок, сек.
+        """
+        self.publish_time = publish_time
+        self.poll_window = poll_window
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self.backoff_max = backoff_max
+
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: datetime | None = None
+        self.last_success_at: datetime | None = None
+        self.last_error: str | None = None
+        self.published_date: date | None = None
+        self.published_rows = 0
+        self.next_run_at: datetime | None = None
+
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, client: aiohttp.ClientSession) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(client))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, client: aiohttp.ClientSession) -> None:
+        # Первый опрос сразу после запуска прогревает кэши после перезапуска
+        while True:
+            delay = await self.run_once(client)
+            self.next_run_at = datetime.now(tz=tz) + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+
+    async def run_once(self, client: aiohttp.ClientSession) -> float:
+        """
+        Загрузить последние опубликованные котировки
+        :param client: Сессия aiohttp для обращения к ЦБ РФ
+        :return: Задержка до следующего опроса, сек.
+        """
+        self.runs += 1
+        self.last_run_at = datetime.now(tz=tz)
+        try:
+            rows = await fetch_xml(client, daily_url(), "Valute", parse_daily_rate)
+            if not rows:
+                raise ValueError("Empty XML_daily response")
+
+            published_date = date.fromisoformat(rows[0]["date"])
+            delay = self._next_delay(published_date)
+
+            stored = await self._store(rows, published_date)
+            await self._warm(client, rows, published_date, delay, stored)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = repr(e)
+            logging.error("Scheduler error: %s", e, exc_info=True)
+            return self._backoff_delay()
+
+        self.failures = 0
+        self.last_error = None
+        self.last_success_at = datetime.now(tz=tz)
+        self.published_date = published_date
+        self.published_rows = len(rows)
+        return delay
+
+    async def _store(self, rows: list[dict], published_date: date) -> bool:
+        # Опрос вернул уже записанные котировки
+        if published_date == self.published_date:
+            return False
+
+        rates = [
+            {
+                "date": published_date,
+                "cb_code": row["cb_code"],
+                "iso_code": row["iso_code"],
+                "nominal": row["nominal"],
+                "value": parse_decimal(row["value"]),
+                "unit_rate": parse_decimal(row["unit_rate"]),
+            }
+            for row in rows
+        ]
+        previous_date = self.published_date
+        async with async_session_factory() as session:
+            await upsert_rates(session, rates)
+
+            # Между соседними публикациями котировок нет, поэтому загруженный
+            # период продлевается до новой даты только у кодов, загруженных
+            # по предыдущую публикацию. Однодневные периоды у остальных кодов
+            # разбивали бы годовые окна догрузки истории
+            if previous_date is not None and previous_date < published_date:
+                cb_codes = [rate["cb_code"] for rate in rates]
+                coverage = await load_coverage(session, cb_codes)
+                for cb_code in cb_codes:
+                    if any(
+                        covered_from <= previous_date <= covered_to
+                        for covered_from, covered_to in coverage.get(cb_code, [])
+                    ):
+                        await add_coverage(
+                            session, cb_code, previous_date, published_date
+                        )
+            await session.commit()
+        return True
+
+    async def _warm(
+        self,
+        client: aiohttp.ClientSession,
+        rows: list[dict],
+        published_date: date,
+        delay: float,
+        stored: bool,
+    ) -> None:
+        # Последние котировки действительны до следующего опроса
+        ttl = delay + self.poll_interval
+        await daily_cache.set("latest", rows, immutable=False, ttl=ttl)
+        await daily_cache.set(
+            published_date.isoformat(),
+            rows,
+            immutable=published_date < datetime.now(tz=tz).date(),
+            ttl=ttl,
+        )
+        # Справочник кодов меняется вместе с публикацией котировок, на
+        # повторных опросах он обновляется только по истечении CBR_CODES_TTL
+        if stored or currency_directory.is_stale:
+            await currency_directory.refresh(client)
+
+    def _next_delay(self, published_date: date) -> float:
+        now = datetime.now(tz=tz)
+        publish_at = tz.localize(datetime.combine(now.date(), self.publish_time))
+
+        # Котировки на следующий день уже опубликованы или окно опроса прошло
+        if published_date > now.date() or now >= publish_at + timedelta(
+            seconds=self.poll_window
+        ):
+            publish_at += timedelta(days=1)
+
+        if now < publish_at:
+            return (publish_at - now).total_seconds() + random.uniform(0, self.jitter)
+        return self.poll_interval + random.uniform(0, self.jitter)
+
+    def _backoff_delay(self) -> float:
+        delay = min(self.backoff_max, self.poll_interval * 2 ** (self.failures - 1))
+        return delay + random.uniform(0, self.jitter)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_run_at": self.last_run_at,
+            "last_success_at": self.last_success_at,
+            "next_run_at": self.next_run_at,
+            "published_date": self.published_date,
+            "published_rows": self.published_rows,
+        }
+
+
+daily_scheduler = DailyRateScheduler(
+    publish_time=time.fromisoformat(settings.scheduler.SCHEDULER_PUBLISH_TIME),
+    poll_window=settings.scheduler.SCHEDULER_POLL_WINDOW,
+    poll_interval=settings.scheduler.SCHEDULER_POLL_INTERVAL,
+    jitter=settings.scheduler.SCHEDULER_JITTER,
+    backoff_max=settings.scheduler.SCHEDULER_BACKOFF_MAX,
+)
@@ -1,292 +1,480 @@
 import asyncio
 import logging
-from datetime import datetime
+import time
+from collections.abc import AsyncIterator
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
 import pytz
 
 import aiohttp
-import requests
 import xml.etree.ElementTree as ET
-
-from api_v1.db.crud import truncate_table
-from api_v1.db.models.models import ExchangeRate
-from api_v1.service.models.models import CurrencyCodeModel, ExchangeRateModel
-
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api_v1.service.cache import CurrencyDirectory, DailyRateCache, UnitRateIndex
+from api_v1.service.coalesce import SingleFlight, normalize_url
+from api_v1.service.limiter import UpstreamLimiter
+from api_v1.service.parser import (
+    RowParser,
+    format_decimal,
+    iter_rows,
+    parse_decimal,
+)
+from api_v1.service.store import (
+    CHANGED_CB_CODES,
+    add_coverage,
+    load_coverage,
+    missing_ranges,
+    read_rates,
+    replace_rates,
+)
+
+from core.config import settings
+from core.metrics import upstream_request_seconds, upstream_retries
+from utils.cache import LRUCache
 from utils.utils import get_random_user_agent
 
 timezone = "Europe/Moscow"
 tz = pytz.timezone(timezone)
 
+# Минимальная дата, с которой ЦБ РФ публикует котировки
+MIN_DATE = date(1992, 7, 1)
 
-async def currency_codes(json_list: bool = False) -> list | dict:
-    url = "https://www.cbr.ru/scripts/XML_valFull.asp"
 
-    currency = []
-    json_list_data = {}
-    for attempt in range(5):  # Число попыток
-        try:
-            async with aiohttp.ClientSession() as aiohttp_session:
-                async with aiohttp_session.get(
-                    url, headers={"User-Agent": get_random_user_agent()}
-                ) as response:
+upstream_flight = SingleFlight()
 
-                    if response.status == 200:
-                        response = await response.text()
-
-                        root = ET.fromstring(response)
-
-                        # Извлечение данных
-                        for item in root.findall("Item"):
-                            cb_code = item.get("ID")
-                            iso_id = item.find("ISO_Num_Code").text
-                            iso_code = item.find("ISO_Char_Code").text
-                            name_ru = item.find("Name").text
-                            name_eng = item.find("EngName").text
-                            nominal = item.find("Nominal").text
-
-                            if json_list:
-                                json_list_data[cb_code] = {
-                                    "iso_id": int(iso_id) if iso_id else None,
-                                    "iso_code": iso_code if iso_code else None,
-                                    "name_ru": name_ru if name_ru else None,
-                                    "name_eng": name_eng if name_eng else None,
-                                }
-
-                            else:
-                                currency.append(
-                                    CurrencyCodeModel(
-                                        cb_code=cb_code,
-                                        iso_id=int(iso_id) if iso_id else None,
-                                        iso_code=iso_code if iso_code else None,
-                                        name_ru=name_ru if name_ru else None,
-                                        name_eng=name_eng if name_eng else None,
-                                        nominal=int(nominal) if nominal else None,
-                                    ).to_dict()
-                                )
-                        break
-        except aiohttp.ClientConnectorError as e:
-            print(f"Попытка {attempt + 1}: Не удалось установить соединение. {e}")
-            await asyncio.sleep(2)  # Задержка перед повторной попыткой
-    if json_list:
-        return json_list_data
-    return currency
+upstream_limiter = UpstreamLimiter(
+    max_concurrency=settings.cbr.CBR_MAX_CONCURRENCY,
+    rate=settings.cbr.CBR_RATE_LIMIT,
+    burst=settings.cbr.CBR_RATE_BURST,
+)
 
 
-async def exchange_rates_daly(date: str = None, currency_iso_code: str = None) -> list:
-    url = (
-        f"http://www.cbr.ru/scripts/XML_daily.asp?date_req={datetime.fromisoformat(date).strftime("%d/%m/%Y")}"
-        if date
-        else f"http://www.cbr.ru/scripts/XML_daily.asp"
+async def fetch_xml(
+    client: aiohttp.ClientSession, url: str, tag: str, parse: RowParser
+) -> list | None:
+    # Одновременные запросы одного и того же URL выполняются один раз
+    return await upstream_flight.run(
+        normalize_url(url), lambda: _fetch_xml(client, url, tag, parse)
     )
 
-    currency = []
 
-    for attempt in range(5):  # Число попыток
+async def _fetch_xml(
+    client: aiohttp.ClientSession, url: str, tag: str, parse: RowParser
+) -> list | None:
+    endpoint = upstream_endpoint(url)
+
+    for attempt in range(settings.cbr.CBR_RETRIES):  # Число попыток
+        started_at = None
+        status = "error"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
+            # Общие на процесс лимиты одновременных запросов и частоты обращений
+            async with upstream_limiter:
+                # Время ожидания лимитов в задержку ЦБ РФ не входит
+                started_at = time.perf_counter()
+                async with client.get(
                     url, headers={"User-Agent": get_random_user_agent()}
                 ) as response:
+                    # Метка статуса - строка, как и "timeout", "error"
+                    status = str(response.status)
+
                     if response.status == 200:
-                        response = await response.text()
-
-                        root = ET.fromstring(response)
-                        date = (
-                            datetime.strptime(root.get("Date"), "%d.%m.%Y")
-                            .date()
-                            .strftime("%Y-%m-%d")
-                        )
-
-                        # Извлечение данных
-                        for record in root.findall("Valute"):
-                            cb_code = record.get("ID")
-                            iso_id = record.find("NumCode").text
-                            iso_code = record.find("CharCode").text
-                            name_ru = record.find("Name").text
-                            nominal = record.find("Nominal").text
-                            value = record.find("Value").text
-                            unit_rate = record.find("VunitRate").text
-
-                            currency_ = ExchangeRateModel(
-                                date=date,
-                                cb_code=cb_code,
-                                iso_id=int(iso_id) if iso_id else None,
-                                iso_code=iso_code,
-                                name_ru=name_ru,
-                                nominal=int(nominal) if nominal else None,
-                                value=value,  # float(value.replace(',', '.')) if value else 0,
-                                unit_rate=unit_rate,  # float(unit_rate.replace(',', '.')) if unit_rate else 0,
-                            ).to_dict()
-
-                            currency.append(currency_)
-                        break
-
-        except aiohttp.ClientConnectorError as e:
-            print(f"Попытка {attempt + 1}: Не удалось установить соединение. {e}")
-            await asyncio.sleep(2)  # Задержка перед повторной попыткой
+                        # Строки разбираются по мере получения ответа
+                        return [
+                            row async for row in iter_rows(response.content, tag, parse)
+                        ]
+
+                    # Ошибки запроса повторять бессмысленно
+                    if response.status < 500 and response.status != 429:
+                        return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            logging.warning(
+                "Попытка %s: Не удалось установить соединение. %s", attempt + 1, e
+            )
+        except ET.ParseError as e:
+            status = "parse_error"
+            logging.warning("Попытка %s: Некорректный XML ответ. %s", attempt + 1, e)
+        finally:
+            if started_at is not None:
+                upstream_request_seconds.observe(
+                    time.perf_counter() - started_at, endpoint, status
+                )
 
-    if currency_iso_code:
-        currency = [c for c in currency if c["iso_code"] == currency_iso_code]
+        if attempt + 1 < settings.cbr.CBR_RETRIES:
+            upstream_retries.inc(endpoint, status)
+            # Задержка перед повторной попыткой
+            await asyncio.sleep(settings.cbr.CBR_RETRY_DELAY)
+    return None  # Возврат None после исчерпания всех попыток
+
+
+def upstream_endpoint(url: str) -> str:
+    """Скрипт ЦБ РФ из URL запроса: XML_daily.asp, XML_dynamic.asp, ..."""
+    return urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+def parse_currency_code(item: ET.Element, root: ET.Element) -> dict:
+    cb_code = item.get("ID")
+    iso_id = item.find("ISO_Num_Code").text
+    iso_code = item.find("ISO_Char_Code").text
+    name_ru = item.find("Name").text
+    name_eng = item.find("EngName").text
+    nominal = item.find("Nominal").text
+
+    # Поля CurrencyCodeModel в том же порядке
+    return {
+        "cb_code": cb_code,
+        "iso_id": int(iso_id) if iso_id else None,
+        "iso_code": iso_code if iso_code else None,
+        "name_ru": name_ru if name_ru else None,
+        "name_eng": name_eng if name_eng else None,
+        "nominal": int(nominal) if nominal else None,
+    }
 
+
+def parse_daily_rate(record: ET.Element, root: ET.Element) -> dict:
+    date = datetime.strptime(root.get("Date"), "%d.%m.%Y").date().strftime("%Y-%m-%d")
+
+    cb_code = record.get("ID")
+    iso_id = record.find("NumCode").text
+    iso_code = record.find("CharCode").text
+    name_ru = record.find("Name").text
+    nominal = record.find("Nominal").text
+    value = record.find("Value").text
+    unit_rate = record.find("VunitRate").text
+    value_num = parse_decimal(value)
+    unit_rate_num = parse_decimal(unit_rate)
+
+    # Поля ExchangeRateModel в том же порядке
+    return {
+        "date": date,
+        "cb_code": cb_code,
+        "iso_id": int(iso_id) if iso_id else None,
+        "iso_code": iso_code,
+        "name_ru": name_ru,
+        "nominal": int(nominal) if nominal else None,
+        "value": value,
+        "unit_rate": unit_rate,
+        "value_num": float(value_num) if value_num is not None else None,
+        "unit_rate_num": float(unit_rate_num) if unit_rate_num is not None else None,
+    }
+
+
+def parse_dynamics_rate(record: ET.Element, root: ET.Element) -> dict:
+    return {
+        "date": datetime.strptime(record.get("Date"), "%d.%m.%Y").date(),
+        "cb_code": record.get("Id"),
+        "nominal": (
+            int(record.find("Nominal").text)
+            if record.find("Nominal") is not None
+            else None
+        ),
+        "value": parse_decimal(record.find("Value").text),
+        "unit_rate": parse_decimal(record.find("VunitRate").text),
+    }
+
+
+async def currency_codes(
+    client: aiohttp.ClientSession, json_list: bool = False
+) -> list | dict:
+    url = f"{settings.cbr.CBR_URL}/XML_valFull.asp"
+
+    currency = await fetch_xml(client, url, "Item", parse_currency_code) or []
+
+    if json_list:
+        return {
+            item["cb_code"]: {
+                "iso_id": item["iso_id"],
+                "iso_code": item["iso_code"],
+                "name_ru": item["name_ru"],
+                "name_eng": item["name_eng"],
+            }
+            for item in currency
+        }
     return currency
 
 
-async def exchange_rates_dynamics(date_from=None, date_to=None, cb_code_codes=None):
-    # Загрузка кодов валют
-    currency_json = await currency_codes(json_list=True)
+currency_directory = CurrencyDirectory(currency_codes, ttl=settings.cbr.CBR_CODES_TTL)
 
-    # Определение начальной и конечной дат
-    start_date = (
-        datetime.fromisoformat(date_from).strftime("%d/%m/%Y")
-        if date_from
-        else "01/07/1992"
-    )
-    end_date = (
-        datetime.fromisoformat(date_to).strftime("%d/%m/%Y")
-        if date_to
-        else datetime.now(tz=tz).strftime("%d/%m/%Y")
-    )
+daily_cache = DailyRateCache(
+    maxsize=settings.cbr.CBR_DAILY_CACHE_SIZE,
+    recent_ttl=settings.cbr.CBR_DAILY_CACHE_TTL,
+    path=settings.cbr.CBR_DAILY_CACHE_DIR,
+)
 
-    # Если коды валют не переданы, извлекаем их из currency_json
-    cb_code_codes = cb_code_codes if cb_code_codes else currency_json.keys()
+unit_rate_index = UnitRateIndex()
 
-    currency = []
 
-    async with aiohttp.ClientSession() as aiohttp_session:
-        tasks = []
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def invalidate_unit_rates(session: Session) -> None:
+    # Изменения видны другим сессиям только после фиксации, а после отката
+    # индекс мог получить незафиксированные курсы из этой же сессии
+    unit_rate_index.invalidate(session.info.pop(CHANGED_CB_CODES, ()))
+
+
+# Готовые тела ответов на неизменяемых данных и их сжатые варианты
+response_cache = LRUCache(
+    settings.http.HTTP_RESPONSE_CACHE_SIZE,
+    maxweight=settings.http.HTTP_RESPONSE_CACHE_BYTES,
+    weigh=lambda entry: entry[0].size,
+)
+# Валидаторы изменяемых ответов для условных запросов
+validator_cache = LRUCache(settings.http.HTTP_VALIDATOR_CACHE_SIZE)
 
-        for parent_code in cb_code_codes:
-            url = f"https://www.cbr.ru/scripts/XML_dynamic.asp?date_req1={start_date}&date_req2={end_date}&VAL_NM_RQ={parent_code}"
-            tasks.append(fetch_currency_data(aiohttp_session, url, currency_json))
 
-        # Ожидание завершения всех асинхронных задач
-        results = await asyncio.gather(*tasks)
-        for result in results:
-            currency.extend(result)
+async def exchange_rates_daly(
+    client: aiohttp.ClientSession, date: str = None, currency_iso_code: str = None
+) -> list:
+    # Котировки на прошедшие даты не меняются и кэшируются без срока жизни
+    today = datetime.now(tz=tz).date()
+    rate_date = datetime.fromisoformat(date).date() if date else None
+    key = rate_date.isoformat() if rate_date else "latest"
+    url = daily_url(rate_date)
+
+    currency = await daily_cache.get(key)
+    if currency is None:
+        currency = await fetch_xml(client, url, "Valute", parse_daily_rate) or []
+        if currency:
+            await daily_cache.set(
+                key, currency, immutable=rate_date is not None and rate_date < today
+            )
+
+    if currency_iso_code:
+        currency = [c for c in currency if c["iso_code"] == currency_iso_code]
 
     return currency
 
 
-async def fetch_currency_data(session, url, currency_json):
+async def exchange_rates_dynamics(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    date_from=None,
+    date_to=None,
+    cb_code_codes=None,
+) -> list[dict]:
+    currency = []
+    async for rows in iter_exchange_rates_dynamics(
+        session, client, date_from, date_to, cb_code_codes
+    ):
+        currency.extend(rows)
 
-    for attempt in range(5):  # Число попыток
-        try:
-            async with session.get(
-                url, headers={"User-Agent": get_random_user_agent()}
-            ) as response:
-
-                if response.status != 200:
-                    return []
-
-                response_text = await response.text()
-                root = ET.fromstring(response_text)
-
-                return [
-                    ExchangeRateModel(
-                        date=record.get("Date"),
-                        cb_code=record.get("Id"),
-                        iso_id=currency_json[record.get("Id")].get("iso_id"),
-                        iso_code=currency_json[record.get("Id")].get("iso_code"),
-                        name_ru=currency_json[record.get("Id")].get("name_ru"),
-                        nominal=(
-                            int(record.find("Nominal").text)
-                            if record.find("Nominal") is not None
-                            else None
-                        ),
-                        value=record.find("Value").text,
-                        unit_rate=record.find("VunitRate").text,
-                    ).to_dict()
-                    for record in root.findall("Record")
-                    if currency_json.get(record.get("Id")) is not None
-                ]
-        except aiohttp.ClientConnectorError as e:
-            print(f"Попытка {attempt + 1}: Не удалось установить соединение. {e}")
-            await asyncio.sleep(2)  # Задержка перед повторной попыткой
-        return []  # Возврат None после исчерпания всех попыток
-
-
-async def period_exchange_rates(
-    session, date_from=None, date_to=None, cb_code_codes: list[str] = None
-) -> list[ExchangeRate]:
-    start_date = (
-        datetime.fromisoformat(date_from).strftime("%d/%m/%Y")
-        if date_to
-        else "01/01/2004"
-    )
+    return currency
+
+
+async def iter_exchange_rates_dynamics(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    date_from=None,
+    date_to=None,
+    cb_code_codes=None,
+) -> AsyncIterator[list[dict]]:
+    """
+    Динамика котировок по кодам валют: котировки каждого кода выдаются сразу,
+    как только загружены его недостающие в хранилище периоды
+    """
+    # Коды валют из справочника в памяти процесса
+    currency_json = (await currency_directory.get(client)).by_cb_code
+
+    # Определение начальной и конечной дат
+    start_date = datetime.fromisoformat(date_from).date() if date_from else MIN_DATE
     end_date = (
-        datetime.fromisoformat(date_to).strftime("%d/%m/%Y")
+        datetime.fromisoformat(date_to).date()
         if date_to
-        else datetime.now().strftime("%d/%m/%Y")
+        else datetime.now(tz=tz).date()
     )
 
-    if not cb_code_codes:
-        cb_code_codes = [
-            "R01239",  # EUR
-            "R01235",  # USD
-            "R01375",  # CNY
-            "R01700J",  # TRY Турецкая лира
-            # СНГ
-            "R01060",  # AMD Армянский драм
-            "R01090",  # BYR Белорусский рубль
-            "R01335",  # KZT Казахстанский тенге
-            "R01370",  # KGS Киргизский сом
-            "R01670",  # TJS Таджикский сомони
-            "R01717",  # UZS Узбекский сум
-            "R01720",  # UAH Украинская гривна
-            "R01020A",  # AZN Азербайджанский манат
-            "R01210",  # GEL Грузинский лари
-        ]
+    # Если коды валют не переданы, извлекаем их из currency_json
+    cb_code_codes = [
+        cb_code
+        for cb_code in (cb_code_codes if cb_code_codes else currency_json.keys())
+        if currency_json.get(cb_code) is not None
+    ]
 
-    iso_codes: dict = {
-        "R01239": "EUR",
-        "R01235": "USD",
-        "R01375": "CNY",
-        "R01370": "KGS",
-        "R01335": "KZT",
-        "R01090": "BYR",
-        "R01060": "AMD",
-        "R01670": "TJS",
-        "R01700J": "TRY",
-        "R01717": "UZS",
-        "R01720": "UAH",
-        "R01020A": "AZN",
-        "R01210": "GEL",
-    }
+    coverage = await load_coverage(session, cb_code_codes)
+    tasks = start_loading(client, coverage, cb_code_codes, start_date, end_date)
 
-    currency = []
-    for parent_code in cb_code_codes:
-        url = f"https://www.cbr.ru/scripts/XML_dynamic.asp?date_req1={start_date}&date_req2={end_date}&VAL_NM_RQ={parent_code}"
-
-        response = requests.get(url)
-
-        root = ET.fromstring(response.text)
-
-        # Извлечение данных
-        for record in root.findall("Record"):
-            date = record.get("Date")
-            cb_code = record.get("Id")
-            nominal = record.find("Nominal").text
-            value = record.find("Value").text
-            unit_rate = record.find("VunitRate").text
-            iso_code = iso_codes.get(parent_code)
-
-            currency.append(
-                ExchangeRate(
-                    date=datetime.strptime(date, "%d.%m.%Y").date(),
-                    cb_code=cb_code,
-                    nominal=int(nominal) if nominal else None,
-                    value=value,  # float(value.replace(',', '.')) if value else 0,
-                    unit_rate=unit_rate,  # float(unit_rate.replace(',', '.')) if unit_rate else 0,
-                    iso_code=iso_code,
+    try:
+        for parent_code in cb_code_codes:
+            currency_info = currency_json[parent_code]
+
+            if tasks[parent_code]:
+                await store_loaded(
+                    session,
+                    parent_code,
+                    tasks[parent_code],
+                    iso_code=currency_info.get("iso_code"),
                 )
+                await session.commit()
+
+            rates = await read_rates(session, [parent_code], start_date, end_date)
+
+            yield [
+                exchange_rate_row(rate, currency_info)
+                for rate in rates.get(parent_code, [])
+            ]
+    finally:
+        # Клиент мог прервать потоковую выдачу, оставшиеся загрузки не нужны
+        cancel_loading(tasks)
+
+
+def exchange_rate_row(rate, currency_info: dict) -> dict:
+    """
+    Строка ответа с полями ExchangeRateModel из котировки хранилища.
+    Модель на строку не строится: ответ сериализуется один раз через orjson
+    """
+    return {
+        "date": rate.date.strftime("%d.%m.%Y"),
+        "cb_code": rate.cb_code,
+        "iso_id": currency_info.get("iso_id"),
+        "iso_code": currency_info.get("iso_code"),
+        "name_ru": currency_info.get("name_ru"),
+        "nominal": rate.nominal,
+        "value": format_decimal(rate.value),
+        "unit_rate": format_decimal(rate.unit_rate),
+        "value_num": float(rate.value) if rate.value is not None else None,
+        "unit_rate_num": float(rate.unit_rate) if rate.unit_rate is not None else None,
+    }
+
+
+async def is_stored(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    cb_codes: list[str],
+    date_from: date,
+    date_to: date,
+) -> bool:
+    """Периоды кодов валют полностью загружены в хранилище"""
+    currency_json = (await currency_directory.get(client)).by_cb_code
+    cb_codes = [cb_code for cb_code in cb_codes if cb_code in currency_json]
+    coverage = await load_coverage(session, cb_codes)
+    return all(
+        not missing_ranges(coverage.get(cb_code, []), date_from, date_to)
+        for cb_code in cb_codes
+    )
+
+
+async def sync_rates(
+    session: AsyncSession,
+    client: aiohttp.ClientSession,
+    cb_codes: list[str],
+    date_from: date,
+    date_to: date,
+) -> None:
+    """Дозагрузить в хранилище недостающие периоды котировок по кодам валют ЦБ РФ"""
+    currency_json = (await currency_directory.get(client)).by_cb_code
+    coverage = await load_coverage(session, cb_codes)
+    tasks = start_loading(client, coverage, cb_codes, date_from, date_to)
+    if not any(tasks.values()):
+        return
+
+    try:
+        for cb_code, windows in tasks.items():
+            await store_loaded(
+                session,
+                cb_code,
+                windows,
+                iso_code=(currency_json.get(cb_code) or {}).get("iso_code"),
+            )
+        await session.commit()
+    finally:
+        cancel_loading(tasks)
+
+
+def start_loading(
+    client: aiohttp.ClientSession,
+    coverage: dict[str, list[tuple[date, date]]],
+    cb_codes: list[str],
+    date_from: date,
+    date_to: date,
+) -> dict[str, list[tuple[date, date, asyncio.Task]]]:
+    """
+    Запустить загрузку периодов, которых ещё нет в хранилище.
+    Длинные периоды разбиваются на окна, загружаемые и повторяемые отдельно,
+    окна всех кодов загружаются сразу в пределах общих лимитов
+    """
+    return {
+        cb_code: [
+            (
+                window_from,
+                window_to,
+                asyncio.create_task(
+                    fetch_currency_data(
+                        client, dynamics_url(cb_code, window_from, window_to)
+                    )
+                ),
+            )
+            for gap_from, gap_to in missing_ranges(
+                coverage.get(cb_code, []), date_from, date_to
             )
+            for window_from, window_to in split_range(gap_from, gap_to)
+        ]
+        for cb_code in cb_codes
+    }
 
-    added_count = 0
 
-    await truncate_table(ExchangeRate)
-    await session.add_all(currency)
-    await session.commit()
-    added_count += len(currency)
+async def store_loaded(
+    session: AsyncSession,
+    cb_code: str,
+    windows: list[tuple[date, date, asyncio.Task]],
+    iso_code: str | None = None,
+) -> None:
+    """Записать загруженные окна кода валюты и отметить их периоды загруженными"""
+    # Котировки на будущие даты ещё могут появиться, их период не закрываем
+    today = datetime.now(tz=tz).date()
+
+    for window_from, window_to, task in windows:
+        records = await task
+        if records is None:
+            continue
+
+        await replace_rates(
+            session, cb_code, window_from, window_to, records, iso_code=iso_code
+        )
+        if window_from <= today:
+            await add_coverage(session, cb_code, window_from, min(window_to, today))
+
+
+def cancel_loading(tasks: dict[str, list[tuple[date, date, asyncio.Task]]]) -> None:
+    for windows in tasks.values():
+        for _, _, task in windows:
+            task.cancel()
+
+
+def split_range(
+    date_from: date, date_to: date, years: int = settings.cbr.CBR_WINDOW_YEARS
+) -> list[tuple[date, date]]:
+    """Разбить период на окна по календарным годам"""
+    if years <= 0:
+        return [(date_from, date_to)]
+
+    windows = []
+    cursor = date_from
+    while cursor <= date_to:
+        # Границы окон совпадают с границами лет, поэтому одинаковые окна
+        # разных запросов объединяются в один запрос к ЦБ РФ
+        window_to = min(date(cursor.year + years - 1, 12, 31), date_to)
+        windows.append((cursor, window_to))
+        cursor = window_to + timedelta(days=1)
+    return windows
+
+
+def daily_url(rate_date: date | None = None) -> str:
+    url = f"{settings.cbr.CBR_URL}/XML_daily.asp"
+    return f"{url}?date_req={rate_date.strftime('%d/%m/%Y')}" if rate_date else url
+
+
+def dynamics_url(cb_code: str, date_from: date, date_to: date) -> str:
+    return (
+        f"{settings.cbr.CBR_URL}/XML_dynamic.asp"
+        f"?date_req1={date_from.strftime('%d/%m/%Y')}"
+        f"&date_req2={date_to.strftime('%d/%m/%Y')}"
+        f"&VAL_NM_RQ={cb_code}"
+    )
 
-    logging.info("Added: %s", added_count)
 
-    return currency
+async def fetch_currency_data(
+    client: aiohttp.ClientSession, url: str
+) -> list[dict] | None:
+    return await fetch_xml(client, url, "Record", parse_dynamics_rate)
@@ -0,0 +1,200 @@
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+from sqlalchemy import (
+    BigInteger,
+    Float,
+    Row,
+    String,
+    select,
+    delete,
+    and_,
+    type_coerce,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.db.models.models import ExchangeRate, ExchangeRateCoverage
+from api_v1.db.repositories import SQLAlchemyRepository
+
+# Коды валют ЦБ РФ, котировки или загруженные периоды которых изменены
+# в текущей транзакции сессии
+CHANGED_CB_CODES = "changed_cb_codes"
+
+
+def mark_changed(session: AsyncSession, cb_codes: Iterable[str]) -> None:
+    session.info.setdefault(CHANGED_CB_CODES, set()).update(cb_codes)
+
+
+def missing_ranges(
+    covered: list[tuple[date, date]], date_from: date, date_to: date
+) -> list[tuple[date, date]]:
+    """Периоды внутри [date_from, date_to], не покрытые загруженными интервалами"""
+    gaps = []
+    cursor = date_from
+
+    for covered_from, covered_to in sorted(covered):
+        if covered_to < cursor:
+            continue
+        if covered_from > date_to:
+            break
+        if covered_from > cursor:
+            gaps.append((cursor, covered_from - timedelta(days=1)))
+        cursor = covered_to + timedelta(days=1)
+        if cursor > date_to:
+            break
+
+    if cursor <= date_to:
+        gaps.append((cursor, date_to))
+
+    return gaps
+
+
+async def load_coverage(
+    session: AsyncSession, cb_codes: list[str]
+) -> dict[str, list[tuple[date, date]]]:
+    """Загруженные периоды по кодам валют ЦБ РФ"""
+    result = await session.execute(
+        select(
+            ExchangeRateCoverage.cb_code,
+            ExchangeRateCoverage.date_from,
+            ExchangeRateCoverage.date_to,
+        ).where(ExchangeRateCoverage.cb_code.in_(cb_codes))
+    )
+
+    coverage = defaultdict(list)
+    for cb_code, date_from, date_to in result:
+        coverage[cb_code].append((date_from, date_to))
+    return coverage
+
+
+async def add_coverage(
+    session: AsyncSession, cb_code: str, date_from: date, date_to: date
+) -> None:
+    """Отметить период загруженным, объединяя его с пересекающимися и смежными"""
+    overlap = and_(
+        ExchangeRateCoverage.cb_code == cb_code,
+        ExchangeRateCoverage.date_from <= date_to + timedelta(days=1),
+        ExchangeRateCoverage.date_to >= date_from - timedelta(days=1),
+    )
+    result = await session.execute(
+        select(ExchangeRateCoverage.date_from, ExchangeRateCoverage.date_to).where(
+            overlap
+        )
+    )
+    for covered_from, covered_to in result:
+        date_from = min(date_from, covered_from)
+        date_to = max(date_to, covered_to)
+
+    await session.execute(delete(ExchangeRateCoverage).where(overlap))
+    session.add(
+        ExchangeRateCoverage(cb_code=cb_code, date_from=date_from, date_to=date_to)
+    )
+    mark_changed(session, [cb_code])
+
+
+async def upsert_rates(session: AsyncSession, rates: list[dict]) -> int:
+    """
+    Записать котировки по уникальному индексу (cb_code, date).
+    Изменяются только новые и отличающиеся строки.
+    """
+    mark_changed(session, (rate["cb_code"] for rate in rates))
+    return await SQLAlchemyRepository(ExchangeRate, session).upsert_many(
+        rates, index_elements=["cb_code", "date"]
+    )
+
+
+async def prune_rates(
+    session: AsyncSession,
+    cb_code: str,
+    date_from: date,
+    date_to: date,
+    rates: list[dict],
+) -> None:
+    """Удалить котировки кода валюты за период, отсутствующие в ответе ЦБ РФ"""
+    await session.execute(
+        delete(ExchangeRate).where(
+            ExchangeRate.cb_code == cb_code,
+            ExchangeRate.date >= date_from,
+            ExchangeRate.date <= date_to,
+            ExchangeRate.date.not_in([rate["date"] for rate in rates]),
+        )
+    )
+    mark_changed(session, [cb_code])
+
+
+async def replace_rates(
+    session: AsyncSession,
+    cb_code: str,
+    date_from: date,
+    date_to: date,
+    rates: list[dict],
+    iso_code: str | None = None,
+) -> int:
+    """
+    Заменить котировки кода валюты за период загруженными из ЦБ РФ.
+    Остальные котировки не затрагиваются, таблица остаётся доступной для чтения.
+    """
+    rates = [{**rate, "iso_code": iso_code} for rate in rates]
+    await upsert_rates(session, rates)
+    await prune_rates(session, cb_code, date_from, date_to, rates)
+    return len(rates)
+
+
+async def read_rates(
+    session: AsyncSession, cb_codes: list[str], date_from: date, date_to: date
+) -> dict[str, list[Row]]:
+    """
+    Котировки из хранилища, сгруппированные по коду валюты и упорядоченные по дате.
+    Строки - кортежи (date, cb_code, nominal, value, unit_rate) с доступом
+    по имени, без ORM объектов
+    """
+    result = await session.execute(
+        select(
+            ExchangeRate.date,
+            ExchangeRate.cb_code,
+            ExchangeRate.nominal,
+            ExchangeRate.value,
+            ExchangeRate.unit_rate,
+        )
+        .where(
+            ExchangeRate.cb_code.in_(cb_codes),
+            ExchangeRate.date >= date_from,
+            ExchangeRate.date <= date_to,
+        )
+        .order_by(ExchangeRate.date)
+    )
+
+    rates = defaultdict(list)
+    for rate in result:
+        rates[rate.cb_code].append(rate)
+    return rates
+
+
+async def read_unit_rates(
+    session: AsyncSession, cb_codes: list[str], date_from: date, date_to: date
+) -> list[tuple[str, date | str, float]]:
+    """
+    Курсы за единицу валюты (cb_code, date, unit_rate) для расчётов.
+    Читаются через Core без ORM объектов и Decimal, в SQLite дата возвращается
+    строкой ISO, а хранимое целое число делится на масштаб напрямую
+    """
+    table = ExchangeRate.__table__
+    connection = await session.connection()
+
+    scale = 1
+    rate_date = table.c.date
+    unit_rate = type_coerce(table.c.unit_rate, Float)
+    if connection.dialect.name == "sqlite":
+        scale = 10**table.c.unit_rate.type.scale
+        rate_date = type_coerce(table.c.date, String)
+        unit_rate = type_coerce(table.c.unit_rate, BigInteger)
+
+    result = await connection.execute(
+        select(table.c.cb_code, rate_date, unit_rate).where(
+            table.c.cb_code.in_(cb_codes),
+            table.c.date >= date_from,
+            table.c.date <= date_to,
+        )
+    )
+    return [(cb_code, rate_date, value / scale) for cb_code, rate_date, value in result]
@@ -0,0 +1 @@
+"""Бенчмарки сервиса с локальной заглушкой cbr.ru"""
@@ -0,0 +1,351 @@
+"""
+Бенчмарки горячих путей сервиса без обращения к cbr.ru.
+
+Запросы к ЦБ РФ обслуживает локальная заглушка, хранилище и кэш котировок
+создаются во временном каталоге. Для каждого бенчмарка выводятся пропускная
+способность, перцентили задержки и пиковая память одного вызова.
+
+Запуск:
+    python -m benchmarks
+    python -m benchmarks --latency 0.02 --error-rate 0.05 --iterations 200 --json
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import orjson
+
+from benchmarks.fixtures import CB_CODES, render_daily, render_dynamic
+from benchmarks.stub import CBRStub
+
+HEADER = (
+    f"{'benchmark':<32} {'iters':>6} {'ops/s':>10} {'rows/s':>12} "
+    f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'peak KiB':>10}"
+)
+
+
+@dataclass
+class BenchResult:
+    name: str
+    samples: list[float]
+    wall: float
+    rows: int
+    peak_memory: int
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль задержки методом ближайшего ранга, мс"""
+        ordered = sorted(self.samples)
+        rank = max(math.ceil(q / 100 * len(ordered)), 1)
+        return ordered[rank - 1] * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "iterations": len(self.samples),
+            "ops_per_sec": round(len(self.samples) / self.wall, 3),
+            "rows_per_sec": round(self.rows / self.wall, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(max(self.samples) * 1000, 3),
+            "peak_kib": round(self.peak_memory / 1024, 1),
+        }
+
+    def line(self) -> str:
+        result = self.to_dict()
+        return (
+            f"{self.name:<32} {result['iterations']:>6} "
+            f"{result['ops_per_sec']:>10.1f} {result['rows_per_sec']:>12.1f} "
+            f"{result['p50_ms']:>9.3f} {result['p90_ms']:>9.3f} "
+            f"{result['p99_ms']:>9.3f} {result['max_ms']:>9.3f} "
+            f"{result['peak_kib']:>10.1f}"
+        )
+
+
+async def measure(
+    name: str,
+    func: Callable[[int], Awaitable[int]],
+    iterations: int,
+    concurrency: int = 1,
+) -> BenchResult:
+    """
+    Выполнить func(i) iterations раз не более чем concurrency одновременно.
+    Пиковая память измеряется отдельным вызовом func(iterations) до замеров
+    времени, чтобы tracemalloc не искажал задержки.
+
+    :param func: Вызов бенчмарка, возвращает число обработанных строк
+    """
+    tracemalloc.start()
+    await func(iterations)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples, rows = [], 0
+    pending = iter(range(iterations))
+
+    async def worker() -> None:
+        nonlocal rows
+        for i in pending:
+            started_at = time.perf_counter()
+            count = await func(i)
+            samples.append(time.perf_counter() - started_at)
+            rows += count
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started_at
+
+    return BenchResult(name, samples, wall, rows, peak_memory)
+
+
+class BytesContent:
+    """Тело ответа с тем же интерфейсом чтения частями, что у aiohttp"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self.body), size):
+            yield self.body[start : start + size]
+
+
+async def run(args: argparse.Namespace) -> list[BenchResult]:
+    stub = CBRStub(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fixtures=args.fixtures,
+    )
+    url = await stub.start()
+    workdir = tempfile.TemporaryDirectory(prefix="cbr_bench_")
+
+    # Настройки читаются при импорте модулей сервиса
+    os.environ.update(
+        {
+            "CBR_URL": url,
+            "CBR_RATE_LIMIT": str(args.rate_limit),
+            "CBR_RETRY_DELAY": str(args.retry_delay),
+            "CBR_DAILY_CACHE_DIR": os.path.join(workdir.name, "daily"),
+            "SQLITE_AIO_DB": os.path.join(workdir.name, "db.db"),
+            "SCHEDULER_ENABLED": "false",
+        }
+    )
+
+    from api_v1.db.crud import async_create_db
+    from api_v1.db.session import async_engine, async_session_factory
+    from api_v1.service.client import create_client_session
+    from api_v1.service.models.models import (
+        ExchangeRateModel,
+        TotalExchangeRateModel,
+    )
+    from api_v1.service.parser import format_decimal, iter_rows
+    from api_v1.service.service import (
+        currency_codes,
+        currency_directory,
+        exchange_rates_daly,
+        exchange_rate_row,
+        exchange_rates_dynamics,
+        parse_daily_rate,
+        parse_dynamics_rate,
+    )
+
+    await async_create_db()
+    client = create_client_session()
+
+    iterations = args.iterations
+    today = date.today()
+    dynamic_xml = render_dynamic("R01235", date(2020, 1, 1), date(2024, 12, 31))
+    daily_xml = render_daily(date(2024, 3, 15))
+
+    async def parse_dynamic(i: int) -> int:
+        rows = [
+            row
+            async for row in iter_rows(
+                BytesContent(dynamic_xml), "Record", parse_dynamics_rate
+            )
+        ]
+        return len(rows)
+
+    async def parse_daily(i: int) -> int:
+        rows = [
+            row
+            async for row in iter_rows(
+                BytesContent(daily_xml), "Valute", parse_daily_rate
+            )
+        ]
+        return len(rows)
+
+    dynamic_rows = [
+        row
+        async for row in iter_rows(
+            BytesContent(dynamic_xml), "Record", parse_dynamics_rate
+        )
+    ]
+
+    currency_info = {"iso_id": 840, "iso_code": "USD", "name_ru": "Доллар США"}
+    dynamic_rates = [SimpleNamespace(**row) for row in dynamic_rows]
+    content = {
+        "total": len(dynamic_rates),
+        "items": [exchange_rate_row(rate, currency_info) for rate in dynamic_rates],
+    }
+
+    async def build_models(i: int) -> int:
+        # Прежний путь: модель на строку и словарь из неё, для сравнения с rows/dict
+        items = [
+            ExchangeRateModel(
+                date=row["date"].strftime("%d.%m.%Y"),
+                cb_code=row["cb_code"],
+                iso_id=840,
+                iso_code="USD",
+                name_ru="Доллар США",
+                nominal=row["nominal"],
+                value=format_decimal(row["value"]),
+                unit_rate=format_decimal(row["unit_rate"]),
+                value_num=float(row["value"]),
+                unit_rate_num=float(row["unit_rate"]),
+            ).to_dict()
+            for row in dynamic_rows
+        ]
+        return len(items)
+
+    async def build_rows(i: int) -> int:
+        # Как в iter_exchange_rates_dynamics: словарь с полями модели без проверки
+        items = [exchange_rate_row(rate, currency_info) for rate in dynamic_rates]
+        return len(items)
+
+    async def serialize_model(i: int) -> int:
+        # Прежний путь: проверка по response_model и сериализация
+        body = orjson.dumps(
+            TotalExchangeRateModel.model_validate(content).model_dump(mode="json")
+        )
+        return len(body) and content["total"]
+
+    async def serialize_orjson(i: int) -> int:
+        return len(orjson.dumps(content)) and content["total"]
+
+    async def fetch_codes(i: int) -> int:
+        return len(await currency_codes(client))
+
+    async def daily_cold(i: int) -> int:
+        # Каждая итерация - новая прошедшая дата, котировки загружаются из заглушки
+        rate_date = today - timedelta(days=30 + i)
+        return len(await exchange_rates_daly(client, rate_date.isoformat()))
+
+    async def daily_warm(i: int) -> int:
+        return len(await exchange_rates_daly(client, "2024-03-15"))
+
+    async def dynamics_cold(i: int) -> int:
+        # Каждая итерация - новый код валюты или новый период, хранилище пустое
+        cb_code = CB_CODES[i % len(CB_CODES)]
+        year = 2019 - i // len(CB_CODES) * args.dynamics_years
+        async with async_session_factory() as session:
+            rows = await exchange_rates_dynamics(
+                session,
+                client,
+                f"{year - args.dynamics_years + 1}-01-01",
+                f"{year}-12-31",
+                [cb_code],
+            )
+        return len(rows)
+
+    async def dynamics_warm(i: int) -> int:
+        async with async_session_factory() as session:
+            rows = await exchange_rates_dynamics(
+                session,
+                client,
+                f"{2019 - args.dynamics_years + 1}-01-01",
+                "2019-12-31",
+                CB_CODES[:2],
+            )
+        return len(rows)
+
+    benchmarks = [
+        ("parse_xml/dynamic", parse_dynamic, 1),
+        ("parse_xml/daily", parse_daily, 1),
+        ("model/ExchangeRateModel", build_models, 1),
+        ("rows/dict", build_rows, 1),
+        ("serialize/response_model", serialize_model, 1),
+        ("serialize/orjson", serialize_orjson, 1),
+        ("currency_codes", fetch_codes, args.concurrency),
+        ("exchange_rates_daly/cold", daily_cold, args.concurrency),
+        ("exchange_rates_daly/warm", daily_warm, args.concurrency),
+        ("exchange_rates_dynamics/cold", dynamics_cold, args.concurrency),
+        ("exchange_rates_dynamics/warm", dynamics_warm, args.concurrency),
+    ]
+
+    results = []
+    try:
+        await currency_directory.refresh(client)
+        for name, func, concurrency in benchmarks:
+            if args.only and not any(name.startswith(o) for o in args.only):
+                continue
+            results.append(await measure(name, func, iterations, concurrency))
+            if not args.json:
+                print(results[-1].line(), flush=True)
+    finally:
+        await client.close()
+        await async_engine.dispose()
+        await stub.stop()
+        workdir.cleanup()
+
+    if not args.json:
+        print(
+            f"stub: requests={dict(sorted(stub.stats.requests.items()))} "
+            f"errors={stub.stats.errors} bytes={stub.stats.bytes_sent}"
+        )
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарки сервиса курсов ЦБ РФ")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--dynamics-years", type=int, default=5, help="Длина периода динамики, лет"
+    )
+    parser.add_argument("--latency", type=float, default=0, help="Задержка, сек.")
+    parser.add_argument("--jitter", type=float, default=0, help="Добавка, сек.")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--fixtures", default=None, help="Каталог записанных ответов")
+    parser.add_argument(
+        "--rate-limit", type=float, default=0, help="Запросов к заглушке в секунду"
+    )
+    parser.add_argument("--retry-delay", type=float, default=0.01)
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="Префиксы имён бенчмарков"
+    )
+    parser.add_argument("--json", action="store_true", help="Результаты в JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.json:
+        print(
+            f"python {sys.version.split()[0]} iterations={args.iterations} "
+            f"concurrency={args.concurrency} latency={args.latency} "
+            f"jitter={args.jitter} error_rate={args.error_rate}"
+        )
+        print(HEADER)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        sys.stdout.buffer.write(
+            orjson.dumps([result.to_dict() for result in results]) + b"\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
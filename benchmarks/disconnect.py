@@ -0,0 +1,100 @@
+"""
+Проверка отмены загрузки при разрыве потоковой выдачи динамики.
+
+Клиент читает первую порцию NDJSON и закрывает поток. Незавершённые окна
+загрузки отменяются, и запросы XML_dynamic.asp к заглушке прекращаются:
+после паузы их число не должно расти.
+
+Запуск:
+    python -m benchmarks.disconnect --codes 10 --years 30 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import date
+
+from benchmarks.fixtures import CB_CODES
+from benchmarks.stub import CBRStub
+
+SCRIPT = "XML_dynamic.asp"
+
+
+async def run(args: argparse.Namespace) -> bool:
+    stub = CBRStub(latency=args.latency)
+    url = await stub.start()
+    workdir = tempfile.TemporaryDirectory(prefix="cbr_disconnect_")
+
+    # Настройки читаются при импорте модулей сервиса
+    os.environ.update(
+        {
+            "CBR_URL": url,
+            "CBR_RATE_LIMIT": str(args.rate_limit),
+            "CBR_DAILY_CACHE_DIR": os.path.join(workdir.name, "daily"),
+            "SQLITE_AIO_DB": os.path.join(workdir.name, "db.db"),
+            "SCHEDULER_ENABLED": "false",
+        }
+    )
+
+    from api_v1.db.crud import async_create_db
+    from api_v1.db.session import async_engine
+    from api_v1.service.client import create_client_session
+    from api_v1.service.router import stream_exchange_rates_dynamics
+    from api_v1.service.service import currency_directory, upstream_flight
+
+    await async_create_db()
+    client = create_client_session()
+    try:
+        await currency_directory.refresh(client)
+
+        year_to = date.today().year - 1
+        stream = stream_exchange_rates_dynamics(
+            client,
+            f"{year_to - args.years + 1}-01-01",
+            f"{year_to}-12-31",
+            CB_CODES[: args.codes],
+        )
+        first = await anext(stream)
+        # Как при разрыве соединения: генератор закрывается до конца выдачи
+        await stream.aclose()
+
+        closed = stub.stats.requests.get(SCRIPT, 0)
+        await asyncio.sleep(args.wait)
+        after = stub.stats.requests.get(SCRIPT, 0)
+        windows = args.codes * args.years
+    finally:
+        await client.close()
+        await async_engine.dispose()
+        await stub.stop()
+        workdir.cleanup()
+
+    print(
+        f"first chunk: {len(first)} bytes, windows: {windows}, "
+        f"{SCRIPT} at close: {closed}, after {args.wait}s: {after}, "
+        f"coalescing: {upstream_flight.stats()}"
+    )
+    return after == closed and closed < windows
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--codes", type=int, default=10)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка, сек.")
+    parser.add_argument(
+        "--rate-limit", type=float, default=20, help="Запросов к заглушке в секунду"
+    )
+    parser.add_argument("--wait", type=float, default=2, help="Пауза после, сек.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    ok = asyncio.run(run(parse_args()))
+    print("OK" if ok else "FAILED: requests continued after disconnect")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+XML ответы ЦБ РФ для заглушки: записанные с cbr.ru файлы или построенные
+по таблице валют в том же формате и кодировке.
+"""
+
+import math
+import os
+from datetime import date, timedelta
+from xml.sax.saxutils import escape
+
+ENCODING = "windows-1251"
+
+# Файлы записанных ответов в каталоге фикстур
+FIXTURE_FILES = {
+    "XML_valFull.asp": "XML_valFull.xml",
+    "XML_daily.asp": "XML_daily.xml",
+    "XML_dynamic.asp": "XML_dynamic.xml",
+}
+
+# cb_code, ISO цифровой и буквенный код, номинал, названия, базовый курс за номинал
+CURRENCIES = [
+    ("R01010", 36, "AUD", 1, "Австралийский доллар", "Australian Dollar", 60.5),
+    ("R01020A", 944, "AZN", 1, "Азербайджанский манат", "Azerbaijan Manat", 53.6),
+    ("R01035", 826, "GBP", 1, "Фунт стерлингов", "British Pound Sterling", 116.2),
+    ("R01060", 51, "AMD", 100, "Армянских драмов", "Armenia Dram", 22.6),
+    ("R01090B", 933, "BYN", 1, "Белорусский рубль", "Belarussian Ruble", 27.9),
+    ("R01100", 975, "BGN", 1, "Болгарский лев", "Bulgarian lev", 50.6),
+    ("R01115", 986, "BRL", 1, "Бразильский реал", "Brazil Real", 18.4),
+    ("R01135", 348, "HUF", 100, "Форинтов", "Hungarian Forint", 25.1),
+    ("R01200", 344, "HKD", 1, "Гонконгский доллар", "Hong Kong Dollar", 11.7),
+    ("R01215", 208, "DKK", 1, "Датская крона", "Danish Krone", 13.3),
+    ("R01235", 840, "USD", 1, "Доллар США", "US Dollar", 91.6),
+    ("R01239", 978, "EUR", 1, "Евро", "Euro", 99.8),
+    ("R01270", 356, "INR", 10, "Индийских рупий", "Indian Rupee", 11.1),
+    ("R01335", 398, "KZT", 100, "Казахстанских тенге", "Kazakhstan Tenge", 20.4),
+    ("R01350", 124, "CAD", 1, "Канадский доллар", "Canadian Dollar", 67.7),
+    ("R01370", 417, "KGS", 10, "Киргизских сомов", "Kyrgyzstan Som", 10.3),
+    ("R01375", 156, "CNY", 1, "Китайский юань", "China Yuan", 12.6),
+    ("R01500", 498, "MDL", 10, "Молдавских леев", "Moldova Lei", 51.6),
+    ("R01535", 578, "NOK", 10, "Норвежских крон", "Norwegian Krone", 87.5),
+    ("R01565", 985, "PLN", 1, "Польский злотый", "Polish Zloty", 23.2),
+    ("R01585F", 946, "RON", 1, "Румынский лей", "Romanian Leu", 20.1),
+    ("R01589", 960, "XDR", 1, "СДР", "SDR", 121.6),
+    ("R01625", 702, "SGD", 1, "Сингапурский доллар", "Singapore Dollar", 68.7),
+    ("R01670", 972, "TJS", 10, "Таджикских сомони", "Tajikistan Ruble", 83.7),
+    ("R01700J", 949, "TRY", 10, "Турецких лир", "Turkish Lira", 28.5),
+    (
+        "R01710A",
+        934,
+        "TMT",
+        1,
+        "Новый туркменский манат",
+        "New Turkmenistan Manat",
+        26.2,
+    ),
+    ("R01717", 860, "UZS", 10000, "Узбекских сумов", "Uzbekistan Sum", 72.9),
+    ("R01720", 980, "UAH", 10, "Украинских гривен", "Ukrainian Hryvnia", 23.5),
+    ("R01760", 203, "CZK", 10, "Чешских крон", "Czech Koruna", 39.4),
+    ("R01770", 752, "SEK", 10, "Шведских крон", "Swedish Krona", 88.6),
+    ("R01775", 756, "CHF", 1, "Швейцарский франк", "Swiss Franc", 103.6),
+    ("R01810", 710, "ZAR", 10, "Южноафриканских рэндов", "S.African Rand", 48.8),
+    ("R01815", 410, "KRW", 1000, "Вон Республики Корея", "South Korean Won", 68.9),
+    ("R01820", 392, "JPY", 100, "Японских иен", "Japanese Yen", 61.7),
+]
+
+CB_CODES = [currency[0] for currency in CURRENCIES]
+
+_by_cb_code = {currency[0]: currency for currency in CURRENCIES}
+
+
+def load_recorded(path: str | None) -> dict[str, bytes]:
+    """Записанные ответы из каталога фикстур по имени скрипта ЦБ РФ"""
+    recorded = {}
+    if not path:
+        return recorded
+
+    for script, file in FIXTURE_FILES.items():
+        file = os.path.join(path, file)
+        if os.path.exists(file):
+            with open(file, "rb") as f:
+                recorded[script] = f.read()
+    return recorded
+
+
+def rate(cb_code: str, rate_date: date) -> float:
+    """Детерминированный курс за номинал: базовый курс с плавными колебаниями"""
+    currency = _by_cb_code[cb_code]
+    shift = CB_CODES.index(cb_code)
+    return currency[6] * (1 + 0.08 * math.sin(rate_date.toordinal() / 45 + shift))
+
+
+def format_number(value: float) -> str:
+    return f"{value:.4f}".replace(".", ",")
+
+
+def is_business_day(rate_date: date) -> bool:
+    return rate_date.weekday() < 5
+
+
+def render_val_full() -> bytes:
+    items = "".join(
+        f'<Item ID="{cb_code}"><Name>{escape(name_ru)}</Name>'
+        f"<EngName>{escape(name_eng)}</EngName><Nominal>{nominal}</Nominal>"
+        f"<ParentCode>{cb_code:<10}</ParentCode>"
+        f"<ISO_Num_Code>{iso_id}</ISO_Num_Code>"
+        f"<ISO_Char_Code>{iso_code}</ISO_Char_Code></Item>"
+        for cb_code, iso_id, iso_code, nominal, name_ru, name_eng, _ in CURRENCIES
+    )
+    return (
+        f'<?xml version="1.0" encoding="{ENCODING}"?>'
+        f'<Valuta name="Foreign Currency Market Lib">{items}</Valuta>'
+    ).encode(ENCODING)
+
+
+def render_daily(rate_date: date) -> bytes:
+    # ЦБ РФ не устанавливает курсы на выходные, отдаются курсы предыдущего дня
+    while not is_business_day(rate_date):
+        rate_date -= timedelta(days=1)
+
+    valutes = "".join(
+        f'<Valute ID="{cb_code}"><NumCode>{iso_id:03d}</NumCode>'
+        f"<CharCode>{iso_code}</CharCode><Nominal>{nominal}</Nominal>"
+        f"<Name>{escape(name_ru)}</Name>"
+        f"<Value>{format_number(rate(cb_code, rate_date))}</Value>"
+        f"<VunitRate>{format_number(rate(cb_code, rate_date) / nominal)}"
+        f"</VunitRate></Valute>"
+        for cb_code, iso_id, iso_code, nominal, name_ru, _, _ in CURRENCIES
+    )
+    return (
+        f'<?xml version="1.0" encoding="{ENCODING}"?>'
+        f'<ValCurs Date="{rate_date:%d.%m.%Y}" name="Foreign Currency Market">'
+        f"{valutes}</ValCurs>"
+    ).encode(ENCODING)
+
+
+def render_dynamic(cb_code: str, date_from: date, date_to: date) -> bytes:
+    nominal = _by_cb_code[cb_code][3] if cb_code in _by_cb_code else 1
+    records = []
+    rate_date = date_from
+    while cb_code in _by_cb_code and rate_date <= date_to:
+        if is_business_day(rate_date):
+            value = rate(cb_code, rate_date)
+            records.append(
+                f'<Record Date="{rate_date:%d.%m.%Y}" Id="{cb_code}">'
+                f"<Nominal>{nominal}</Nominal>"
+                f"<Value>{format_number(value)}</Value>"
+                f"<VunitRate>{format_number(value / nominal)}</VunitRate></Record>"
+            )
+        rate_date += timedelta(days=1)
+
+    return (
+        f'<?xml version="1.0" encoding="{ENCODING}"?>'
+        f'<ValCurs ID="{cb_code}" DateRange1="{date_from:%d.%m.%Y}" '
+        f'DateRange2="{date_to:%d.%m.%Y}" name="Foreign Currency Market Dynamic">'
+        f"{''.join(records)}</ValCurs>"
+    ).encode(ENCODING)
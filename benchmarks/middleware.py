@@ -0,0 +1,144 @@
+"""
+Микробенчмарк middleware: стоимость запроса с заголовками безопасности через
+BaseHTTPMiddleware (как было в main.py) и через RequestMiddleware.
+
+Приложение вызывается напрямую по ASGI без HTTP сервера, поэтому разница
+задержек - собственная стоимость middleware.
+
+Запуск:
+    python -m benchmarks.middleware --iterations 20000
+"""
+
+import argparse
+import asyncio
+import sys
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from benchmarks.bench import HEADER, BenchResult, measure
+from core.config import settings
+from core.middleware import RequestMiddleware
+
+
+async def add_security_headers(request, call_next):
+    # Прежний вариант из main.py
+    response = await call_next(request)
+
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["X-Frame-Options"] = "DENY"
+    response.headers["X-XSS-Protection"] = "1; mode=block"
+
+    return response
+
+
+async def plain(request):
+    return PlainTextResponse("ok")
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(10):
+            yield b"x" * 1024
+
+    return StreamingResponse(chunks())
+
+
+def create_app(middleware: list[Middleware]) -> Starlette:
+    return Starlette(
+        routes=[Route("/plain", plain), Route("/stream", stream)],
+        middleware=middleware,
+    )
+
+
+APPS = {
+    "none": [],
+    "BaseHTTPMiddleware": [
+        Middleware(BaseHTTPMiddleware, dispatch=add_security_headers)
+    ],
+    "RequestMiddleware": [
+        Middleware(
+            RequestMiddleware,
+            security_headers=settings.http.HTTP_SECURITY_HEADERS,
+            request_id_header=settings.http.HTTP_REQUEST_ID_HEADER,
+            server_timing=settings.http.HTTP_SERVER_TIMING,
+            metrics=settings.http.HTTP_METRICS,
+        )
+    ],
+}
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-request-id", b"bench-1")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    connected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент остаётся подключённым до конца ответа
+        await connected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+    return 1
+
+
+async def run(args: argparse.Namespace) -> list[BenchResult]:
+    results = []
+    for path in ("/plain", "/stream"):
+        for name, middleware in APPS.items():
+            app = create_app(middleware)
+
+            async def request(i: int, app=app) -> int:
+                return await call(app, path)
+
+            results.append(
+                await measure(f"{path[1:]}/{name}", request, args.iterations)
+            )
+            print(results[-1].line(), flush=True)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микробенчмарк middleware")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"python {sys.version.split()[0]} iterations={args.iterations}")
+    print(HEADER)
+    results = {result.name: result for result in asyncio.run(run(args))}
+
+    for path in ("plain", "stream"):
+        baseline = results[f"{path}/none"].percentile(50)
+        overhead = ", ".join(
+            f"{name} {(results[f'{path}/{name}'].percentile(50) - baseline) * 1000:.1f} us"
+            for name in APPS
+            if name != "none"
+        )
+        print(f"{path}: p50 overhead per request: {overhead}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Локальная заглушка cbr.ru для бенчмарков.
+
+Отдаёт XML_valFull.asp, XML_daily.asp и XML_dynamic.asp из фикстур с заданной
+задержкой и долей ошибок.
+
+Запуск:
+    python -m benchmarks.stub --port 8081 --latency 0.05 --error-rate 0.01
+    CBR_URL=http://127.0.0.1:8081/scripts uvicorn main:app
+
+Запись ответов cbr.ru в каталог фикстур:
+    python -m benchmarks.stub --record benchmarks/data
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.fixtures import (
+    ENCODING,
+    FIXTURE_FILES,
+    load_recorded,
+    render_daily,
+    render_dynamic,
+    render_val_full,
+)
+
+RECORD_URL = "https://www.cbr.ru/scripts"
+
+RECORD_PARAMS = {
+    "XML_valFull.asp": {},
+    "XML_daily.asp": {"date_req": "15/03/2024"},
+    "XML_dynamic.asp": {
+        "date_req1": "01/01/2020",
+        "date_req2": "31/12/2024",
+        "VAL_NM_RQ": "R01235",
+    },
+}
+
+
+@dataclass
+class StubStats:
+    requests: dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    bytes_sent: int = 0
+
+
+class CBRStub:
+    """
+    Заглушка cbr.ru.
+
+    Записанные ответы отдаются как есть, XML_dynamic.asp - с записями только за
+    запрошенный период и с запрошенным кодом валюты. Без записанных ответов
+    XML строится по таблице валют из benchmarks.fixtures.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        error_status: int = 500,
+        fixtures: str | None = None,
+        seed: int = 0,
+    ):
+        """
+        :param latency: Задержка перед ответом, сек.
+        :param jitter: Случайная добавка к задержке, сек.
+        :param error_rate: Доля ответов с ошибкой
+        :param error_status: Статус ответа с ошибкой, 500 или 429 повторяются
+        :param fixtures: (Optional) Каталог записанных ответов
+        :param seed: Начальное значение генератора задержек и ошибок
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.stats = StubStats()
+
+        self.recorded = load_recorded(fixtures)
+        self.val_full = self.recorded.get("XML_valFull.asp") or render_val_full()
+        self.dynamic_records = split_records(self.recorded.get("XML_dynamic.asp"))
+
+        self.app = web.Application()
+        self.app.router.add_get("/scripts/{script}", self.handle)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запустить заглушку и вернуть адрес для CBR_URL"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}/scripts"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        script = request.match_info["script"]
+        self.stats.requests[script] = self.stats.requests.get(script, 0) + 1
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.random.random() < self.error_rate:
+            self.stats.errors += 1
+            return web.Response(status=self.error_status)
+
+        if script == "XML_valFull.asp":
+            body = self.val_full
+        elif script == "XML_daily.asp":
+            body = self.daily(request.query.get("date_req"))
+        elif script == "XML_dynamic.asp":
+            body = self.dynamic(
+                request.query["VAL_NM_RQ"],
+                parse_date(request.query["date_req1"]),
+                parse_date(request.query["date_req2"]),
+            )
+        else:
+            raise web.HTTPNotFound()
+
+        self.stats.bytes_sent += len(body)
+        return web.Response(body=body, content_type="application/xml", charset=ENCODING)
+
+    def daily(self, date_req: str | None) -> bytes:
+        if "XML_daily.asp" in self.recorded:
+            return self.recorded["XML_daily.asp"]
+        return render_daily(parse_date(date_req) if date_req else date.today())
+
+    def dynamic(self, cb_code: str, date_from: date, date_to: date) -> bytes:
+        if self.dynamic_records is None:
+            return render_dynamic(cb_code, date_from, date_to)
+
+        records = "".join(
+            record.replace("{cb_code}", cb_code)
+            for record_date, record in self.dynamic_records
+            if date_from <= record_date <= date_to
+        )
+        return (
+            f'<?xml version="1.0" encoding="{ENCODING}"?>'
+            f'<ValCurs ID="{cb_code}" DateRange1="{date_from:%d.%m.%Y}" '
+            f'DateRange2="{date_to:%d.%m.%Y}" name="Foreign Currency Market Dynamic">'
+            f"{records}</ValCurs>"
+        ).encode(ENCODING)
+
+
+def split_records(body: bytes | None) -> list[tuple[date, str]] | None:
+    """Записи XML_dynamic.asp с датами и шаблоном кода валюты"""
+    if body is None:
+        return None
+
+    root = ET.fromstring(body)
+    records = []
+    for record in root.iter("Record"):
+        record.set("Id", "{cb_code}")
+        records.append(
+            (
+                parse_date(record.get("Date"), "%d.%m.%Y"),
+                ET.tostring(record, encoding="unicode"),
+            )
+        )
+    return records
+
+
+def parse_date(value: str, date_format: str = "%d/%m/%Y") -> date:
+    return datetime.strptime(value, date_format).date()
+
+
+async def record(path: str) -> None:
+    """Записать ответы cbr.ru в каталог фикстур"""
+    os.makedirs(path, exist_ok=True)
+    async with aiohttp.ClientSession() as client:
+        for script, params in RECORD_PARAMS.items():
+            async with client.get(f"{RECORD_URL}/{script}", params=params) as response:
+                response.raise_for_status()
+                body = await response.read()
+            with open(os.path.join(path, FIXTURE_FILES[script]), "wb") as f:
+                f.write(body)
+            print(f"{script}: {len(body)} bytes")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    stub = CBRStub(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fixtures=args.fixtures,
+    )
+    url = await stub.start(args.host, args.port)
+    print(f"CBR stub: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Заглушка cbr.ru для бенчмарков")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0, help="Задержка, сек.")
+    parser.add_argument("--jitter", type=float, default=0, help="Добавка, сек.")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--fixtures", default=None, help="Каталог записанных ответов")
+    parser.add_argument("--record", default=None, help="Записать ответы cbr.ru")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        asyncio.run(record(args.record) if args.record else serve(args))
+    except KeyboardInterrupt:
+        pass
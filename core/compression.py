@@ -0,0 +1,228 @@
+import asyncio
+import gzip
+
+from starlette.responses import Response
+
+from core.conditional import encoded_etag
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Сжатие ответов, формируемых на каждый запрос: быстрые уровни
+FAST_LEVELS = {"zstd": 3, "br": 4, "gzip": 5}
+# Сжатие кэшируемых ответов выполняется один раз: максимальные уровни
+BEST_LEVELS = {"zstd": 19, "br": 11, "gzip": 9}
+# Максимальные уровни на больших телах занимают десятки секунд: умеренные
+MODERATE_LEVELS = {"zstd": 9, "br": 5, "gzip": 6}
+BEST_MAX_SIZE = 256 * 1024
+
+# Тела от этого размера сжимаются в пуле потоков, не блокируя цикл событий
+THREAD_MIN_SIZE = 64 * 1024
+
+# Доступные кодировки в порядке предпочтения при равном весе у клиента
+ENCODINGS = [
+    encoding
+    for encoding, available in (
+        ("zstd", zstandard is not None),
+        ("br", brotli is not None),
+        ("gzip", True),
+    )
+    if available
+]
+
+COMPRESSIBLE_TYPES = (
+    b"application/json",
+    b"application/x-ndjson",
+    b"application/xml",
+    b"application/javascript",
+    b"text/",
+)
+
+
+def compress(body: bytes, encoding: str, levels: dict[str, int] = FAST_LEVELS) -> bytes:
+    level = levels[encoding]
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """
+    Кодировка из заголовка Accept-Encoding: наибольший вес, при равном весе -
+    порядок ENCODINGS. `*` означает любую доступную кодировку.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    default = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, default)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+async def compress_async(
+    body: bytes, encoding: str, levels: dict[str, int] = FAST_LEVELS
+) -> bytes:
+    """Сжатие больших тел в пуле потоков, небольших - сразу"""
+    if len(body) < THREAD_MIN_SIZE:
+        return compress(body, encoding, levels)
+    return await asyncio.to_thread(compress, body, encoding, levels)
+
+
+class CompressedBody:
+    """
+    Тело ответа и его сжатые варианты, каждый сжимается один раз.
+    Одновременные запросы одной кодировки ожидают одно и то же сжатие
+    """
+
+    __slots__ = ("body", "media_type", "encoded", "_pending")
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.encoded: dict[str, bytes] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+
+    @property
+    def size(self) -> int:
+        """Объём тела и сжатых вариантов, байт"""
+        return len(self.body) + sum(map(len, self.encoded.values()))
+
+    async def encode(self, encoding: str) -> bytes:
+        body = self.encoded.get(encoding)
+        if body is not None:
+            return body
+
+        future = self._pending.get(encoding)
+        if future is None:
+            levels = BEST_LEVELS if len(self.body) <= BEST_MAX_SIZE else MODERATE_LEVELS
+            future = self._pending[encoding] = asyncio.ensure_future(
+                compress_async(self.body, encoding, levels)
+            )
+        try:
+            # Отмена одного запроса не прерывает сжатие для остальных
+            body = await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._pending.pop(encoding, None)
+        self.encoded[encoding] = body
+        return body
+
+    async def response(self, accept_encoding: str | None, min_size: int) -> Response:
+        encoding = negotiate(accept_encoding) if len(self.body) >= min_size else None
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding is None:
+            return Response(self.body, media_type=self.media_type, headers=headers)
+
+        headers["Content-Encoding"] = encoding
+        body = await self.encode(encoding)
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов по Accept-Encoding: zstd, br, gzip.
+
+    Сжимаются ответы из одного сообщения тела не меньше min_size байт
+    с текстовыми типами содержимого. Потоковые ответы и ответы с уже заданным
+    Content-Encoding, например из кэша сжатых ответов, передаются без изменений.
+    """
+
+    def __init__(self, app: ASGIApp, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = negotiate(value.decode("latin-1"))
+                break
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                if self.compressible(message):
+                    # Решение принимается по первому сообщению тела
+                    start_message = message
+                    return
+                await send(message)
+                return
+
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.min_size:
+                await send(start)
+                await send(message)
+                return
+
+            body = await compress_async(body, encoding)
+            headers, vary = [], b"Accept-Encoding"
+            for name, value in start.get("headers", ()):
+                name = name.lower()
+                if name == b"vary":
+                    vary = value + b", " + vary
+                elif name == b"etag":
+                    # Сжатый вариант - другое представление со своим ETag
+                    etag = encoded_etag(value.decode("latin-1"), encoding)
+                    headers.append((name, etag.encode("latin-1")))
+                elif name != b"content-length":
+                    headers.append((name, value))
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", vary),
+            ]
+            await send({**start, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def compressible(message: Message) -> bool:
+        content_type = b""
+        for name, value in message.get("headers", ()):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,95 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+
+from starlette.responses import Response
+
+# Кодировки ответов, у вариантов в которых собственные ETag
+CODINGS = ("zstd", "br", "gzip")
+
+
+def make_etag(tag: str, payload: bytes) -> str:
+    """
+    Сильный ETag: метка данных, например дата котировок, и хэш содержимого
+    :param tag: Метка данных
+    :param payload: Содержимое ответа в сериализованном виде
+    """
+    return f'"{tag}-{blake2b(payload, digest_size=8).hexdigest()}"'
+
+
+def encoded_etag(etag: str, encoding: str | None) -> str:
+    """
+    ETag варианта ответа в кодировке Content-Encoding: у разных кодировок
+    одного содержимого разные сильные валидаторы, "tag-hash" -> "tag-hash-gzip"
+    """
+    if encoding is None or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _base_etag(etag: str) -> str:
+    etag = etag.strip().removeprefix("W/")
+    for encoding in CODINGS:
+        if etag.endswith(f'-{encoding}"'):
+            return etag[: -len(encoding) - 2] + '"'
+    return etag
+
+
+def cache_control(max_age: int, immutable: bool = False) -> str:
+    if immutable:
+        return f"public, max-age={max_age}, immutable"
+    return f"public, max-age={max_age}, must-revalidate"
+
+
+@dataclass(frozen=True, slots=True)
+class Validators:
+    """
+    Валидаторы ответа для условных запросов If-None-Match и If-Modified-Since.
+    size - размер тела без сжатия, по нему определяется кодировка ответа 304
+    """
+
+    etag: str
+    cache_control: str
+    last_modified: datetime | None = None
+    size: int = 0
+
+    def headers(self, encoding: str | None = None) -> dict[str, str]:
+        headers = {
+            "ETag": encoded_etag(self.etag, encoding),
+            "Cache-Control": self.cache_control,
+        }
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, if_none_match: str | None, if_modified_since: str | None) -> bool:
+        """
+        Ответ не изменился. If-None-Match имеет приоритет над If-Modified-Since,
+        ETag сравниваются без учёта признака W/ и суффикса кодировки: содержимое
+        вариантов одно и то же.
+        """
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            return self.etag in {_base_etag(tag) for tag in if_none_match.split(",")}
+
+        if not if_modified_since or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return self.last_modified <= since
+
+    def not_modified(self, encoding: str | None = None) -> Response:
+        """Ответ 304 с ETag варианта, который был бы отдан в кодировке encoding"""
+        return Response(status_code=304, headers=self.headers(encoding))
+
+
+def last_modified(published: datetime) -> datetime:
+    """Last-Modified с точностью до секунды и не позже текущего времени"""
+    now = datetime.now(tz=timezone.utc)
+    return min(published.astimezone(timezone.utc), now).replace(microsecond=0)
@@ -33,6 +33,9 @@ class AuthConfig(DefaultConfig):
 
     SECURE_COOKIES: bool = True
 
+    AUTH_CACHE_SIZE: int = 10000  # Число проверенных токенов в памяти
+    AUTH_CACHE_TTL: int = 300  # Время жизни проверенного токена в кэше, сек.
+
 
 class UvicornConfig(DefaultConfig):
     APP: str = "main:app"
@@ -69,6 +72,69 @@ class UvicornConfig(DefaultConfig):
         }
 
 
+class CBRConfig(DefaultConfig):
+    CBR_URL: str = "https://www.cbr.ru/scripts"
+
+    CBR_TIMEOUT: float = 60  # Общий таймаут запроса, сек.
+    CBR_CONNECT_TIMEOUT: float = 10
+    CBR_READ_TIMEOUT: float = 30
+
+    CBR_LIMIT: int = 100  # Всего соединений в пуле
+    CBR_LIMIT_PER_HOST: int = 20
+    CBR_DNS_TTL: int = 300  # Время жизни DNS кэша, сек.
+    CBR_KEEPALIVE_TIMEOUT: float = 30
+
+    CBR_RETRIES: int = 5  # Число попыток
+    CBR_RETRY_DELAY: float = 2  # Задержка перед повторной попыткой, сек.
+
+    CBR_MAX_CONCURRENCY: int = 8  # Одновременных запросов к ЦБ РФ на процесс
+    CBR_RATE_LIMIT: float = 10  # Запросов к ЦБ РФ в секунду, 0 - без ограничения
+    CBR_RATE_BURST: int = 10
+    CBR_WINDOW_YEARS: int = 1  # Длина окна загрузки динамики, лет. 0 - без разбиения
+    CBR_INGEST_BATCH_SIZE: int = 20000  # Строк в пакете записи при загрузке истории
+    CBR_EXPORT_BATCH_SIZE: int = 65536  # Строк в пакете столбцов при выгрузке истории
+    CBR_CONVERT_MAX_ITEMS: int = 100000  # Сумм в одном запросе пересчёта
+    CBR_CONVERT_LOOKBACK_DAYS: int = 30  # Насколько курс может быть старше даты суммы
+
+    CBR_CODES_TTL: int = 43200  # Время жизни справочника кодов валют, сек.
+
+    CBR_DAILY_CACHE_SIZE: int = 1024  # Число дат с котировками в памяти
+    CBR_DAILY_CACHE_TTL: int = 300  # Время жизни котировок на сегодня и завтра, сек.
+    CBR_DAILY_CACHE_DIR: Optional[str] = os.path.join(DB_PATH_SQLITE, "daily")
+
+
+class SchedulerConfig(DefaultConfig):
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_PUBLISH_TIME: str = "15:30"  # Время публикации котировок ЦБ РФ, МСК
+    SCHEDULER_POLL_WINDOW: int = 21600  # Сколько опрашивать после публикации, сек.
+    SCHEDULER_POLL_INTERVAL: float = 300  # Интервал опроса, сек.
+    SCHEDULER_JITTER: float = 60  # Случайная добавка к интервалу, сек.
+    SCHEDULER_BACKOFF_MAX: float = 3600  # Максимальный интервал после ошибок, сек.
+
+
+class HTTPConfig(DefaultConfig):
+    # Заголовки безопасности всех ответов, в переменной окружения - JSON
+    HTTP_SECURITY_HEADERS: dict[str, str] = {
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "X-XSS-Protection": "1; mode=block",
+        # "Content-Security-Policy": "default-src 'self'; script-src 'self' https://apis.example.com; style-src 'self' 'unsafe-inline';",
+    }
+    HTTP_REQUEST_ID_HEADER: Optional[str] = "X-Request-ID"  # Пусто - отключить
+    HTTP_SERVER_TIMING: bool = True
+    HTTP_METRICS: bool = True  # Время обработки запросов в метриках
+
+    HTTP_COMPRESSION: bool = True  # Сжатие ответов: zstd, br, gzip
+    HTTP_COMPRESSION_MIN_SIZE: int = 1024  # Меньшие ответы не сжимаются, байт
+    HTTP_RESPONSE_CACHE_SIZE: int = 128  # Готовых ответов на неизменяемых данных
+    HTTP_RESPONSE_CACHE_BYTES: int = 256 * 1024 * 1024  # Объём тел и сжатых вариантов
+    HTTP_RESPONSE_CACHE_MAX_BODY: int = 16 * 1024 * 1024  # Большие тела не кэшируются
+
+    HTTP_MAX_AGE: int = 60  # Cache-Control изменяемых ответов, сек.
+    HTTP_IMMUTABLE_MAX_AGE: int = 31536000  # Cache-Control котировок на прошедшие даты
+    HTTP_VALIDATOR_CACHE_SIZE: int = 1024  # ETag и Last-Modified изменяемых ответов
+
+
 class DBSettings(DefaultConfig):
     SQLITE_AIO_SYSTEM: str = "sqlite"
     SQLITE_AIO_DRIVER: str = "aiosqlite"
@@ -76,6 +142,18 @@ class DBSettings(DefaultConfig):
 
     ECHO: bool = False
 
+    DB_POOL_SIZE: int = 5  # Постоянных соединений в пуле
+    DB_MAX_OVERFLOW: int = 10  # Дополнительных соединений сверх DB_POOL_SIZE
+    DB_POOL_TIMEOUT: float = 30  # Ожидание свободного соединения, сек.
+    DB_POOL_RECYCLE: int = 1800  # Время жизни соединения, сек. -1 - без ограничения
+    DB_POOL_PRE_PING: bool = True
+
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Байт
+    SQLITE_CACHE_SIZE: int = -64 * 1024  # Отрицательное значение - в КиБ
+    SQLITE_BUSY_TIMEOUT: int = 5000  # Ожидание блокировки записи, мс
+
     POSTGRES_SYSTEM: Optional[str] = None
     POSTGRES_DRIVER: Optional[str] = None
 
@@ -116,7 +194,10 @@ class Settings(BaseSettings):
     use_sqlite: bool = True
     api_v1_prefix: str = "/cb_rf/api/v1"
     auth: AuthConfig = AuthConfig()
+    cbr: CBRConfig = CBRConfig()
     db: DBSettings = DBSettings()
+    http: HTTPConfig = HTTPConfig()
+    scheduler: SchedulerConfig = SchedulerConfig()
     uvicorn: UvicornConfig = UvicornConfig()
 
     def show(self):
@@ -9,6 +9,12 @@ from fastapi.openapi.docs import (
     get_swagger_ui_oauth2_redirect_html,
 )
 
+from api_v1.db.crud import async_create_db
+from api_v1.db.session import async_engine
+from api_v1.service.client import create_client_session
+from api_v1.service.scheduler import daily_scheduler
+from core.config import settings
+
 tags_metadata = [
     {
         "name": "CB RF",
@@ -18,12 +24,18 @@ tags_metadata = [
 ]
 
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # startup
-#     yield
-#     # shutdown
-#     await db_helper.dispose()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup
+    await async_create_db()
+    app.state.client_session = create_client_session()
+    if settings.scheduler.SCHEDULER_ENABLED:
+        daily_scheduler.start(app.state.client_session)
+    yield
+    # shutdown
+    await daily_scheduler.stop()
+    await app.state.client_session.close()
+    await async_engine.dispose()
 
 
 def register_static_docs_routes(app: FastAPI):
@@ -54,6 +66,7 @@ def create_app(create_custom_static_urls: bool = False) -> FastAPI:
 
     app = FastAPI(
         default_response_class=ORJSONResponse,
+        lifespan=lifespan,
         title="CB RF API",
         description="This is a simple service",
         version="0.0.1",
@@ -0,0 +1,39 @@
+from utils.metrics import MetricsRegistry
+
+metrics = MetricsRegistry()
+
+http_request_seconds = metrics.histogram(
+    "cbr_api_http_request_duration_seconds",
+    "Время обработки запроса до отправки ответа целиком, сек.",
+    ("method", "route", "status"),
+)
+upstream_request_seconds = metrics.histogram(
+    "cbr_api_upstream_request_duration_seconds",
+    "Время попытки запроса к ЦБ РФ вместе с разбором ответа, сек.",
+    ("endpoint", "status"),
+)
+upstream_retries = metrics.counter(
+    "cbr_api_upstream_retries_total",
+    "Повторные попытки запросов к ЦБ РФ",
+    ("endpoint", "reason"),
+)
+xml_parse_seconds = metrics.histogram(
+    "cbr_api_xml_parse_duration_seconds",
+    "Время разбора XML ответа ЦБ РФ без ожидания сети, сек.",
+    ("tag",),
+)
+xml_rows = metrics.counter(
+    "cbr_api_xml_rows_total",
+    "Строки, разобранные из XML ответов ЦБ РФ",
+    ("tag",),
+)
+db_query_seconds = metrics.histogram(
+    "cbr_api_db_query_duration_seconds",
+    "Время выполнения запроса к базе данных, сек.",
+    ("statement",),
+)
+auth_check_seconds = metrics.histogram(
+    "cbr_api_auth_check_duration_seconds",
+    "Время проверки токена, сек.",
+    ("result",),
+)
@@ -0,0 +1,125 @@
+import re
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_seconds
+
+# Допустимый входящий идентификатор запроса, иначе создаётся новый
+REQUEST_ID_PATTERN = re.compile(rb"[A-Za-z0-9._:\-]{1,128}")
+
+
+class RequestMiddleware:
+    """
+    ASGI middleware заголовков и учёта запросов.
+
+    В отличие от BaseHTTPMiddleware не создаёт задач и потоков памяти на запрос
+    и не буферизует потоковые ответы: заголовки дописываются в сообщение
+    http.response.start, тело ответа проходит без изменений.
+
+    - Заголовки безопасности, если приложение не установило их само.
+    - Идентификатор запроса: входящий заголовок или новый UUID, доступен
+      обработчикам как `request.state.request_id` и возвращается в ответе.
+    - Server-Timing: время до начала ответа, мс.
+    - Время обработки запроса целиком в метрике по шаблону маршрута.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        security_headers: dict[str, str] | None = None,
+        request_id_header: str | None = "X-Request-ID",
+        server_timing: bool = True,
+        metrics: bool = True,
+    ):
+        """
+        :param security_headers: (Optional) Заголовки, добавляемые к каждому ответу
+        :param request_id_header: (Optional) Заголовок идентификатора, None - отключить
+        :param server_timing: (Optional) Добавлять заголовок Server-Timing
+        :param metrics: (Optional) Учитывать время обработки в метриках
+        """
+        self.app = app
+        self.security_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in (security_headers or {}).items()
+        ]
+        self.request_id_header = (
+            request_id_header.lower().encode("latin-1") if request_id_header else None
+        )
+        self.server_timing = server_timing
+        self.metrics = metrics
+        self._routes: dict | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        request_id = None
+        if self.request_id_header:
+            request_id = self.request_id(scope)
+            scope.setdefault("state", {})["request_id"] = request_id.decode("latin-1")
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": self.response_headers(
+                        message.get("headers", ()), request_id, started_at
+                    ),
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if self.metrics:
+                http_request_seconds.observe(
+                    time.perf_counter() - started_at,
+                    scope["method"],
+                    self.route(scope),
+                    status_code,
+                )
+
+    def request_id(self, scope: Scope) -> bytes:
+        for name, value in scope["headers"]:
+            if name == self.request_id_header:
+                if REQUEST_ID_PATTERN.fullmatch(value):
+                    return value
+                break
+        return uuid.uuid4().hex.encode("latin-1")
+
+    def response_headers(
+        self, raw_headers, request_id: bytes | None, started_at: float
+    ) -> list[tuple[bytes, bytes]]:
+        headers = list(raw_headers)
+        if self.security_headers:
+            present = {name.lower() for name, _ in headers}
+            headers.extend(
+                header for header in self.security_headers if header[0] not in present
+            )
+        if request_id is not None:
+            headers.append((self.request_id_header, request_id))
+        if self.server_timing:
+            duration = (time.perf_counter() - started_at) * 1000
+            headers.append((b"server-timing", b"app;dur=%.1f" % duration))
+        return headers
+
+    def route(self, scope: Scope) -> str:
+        # Маршрутизатор дописывает обработчик в scope, шаблон пути берём по нему
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            self._routes = {
+                route.endpoint: route.path
+                for route in scope["app"].routes
+                if hasattr(route, "endpoint")
+            }
+        return self._routes.get(endpoint, "unmatched")
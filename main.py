@@ -1,28 +1,20 @@
 import uvicorn
 from fastapi import FastAPI
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from api_v1 import router as router_v1
+from core.compression import CompressionMiddleware
 from core.config import settings
 from core.create_fasapi_app import create_app
-
-
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-
-    # Установка безопасных заголовков
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    # response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' https://apis.example.com; style-src 'self' 'unsafe-inline';"
-
-    return response
-
+from core.middleware import RequestMiddleware
 
 app: FastAPI = create_app(create_custom_static_urls=True)
-# Добавляем middleware с безопасными заголовками
-app.add_middleware(BaseHTTPMiddleware, dispatch=add_security_headers)
+
+# Сжатие ответов по Accept-Encoding, ответы из кэша уже сжаты и не изменяются
+if settings.http.HTTP_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware, min_size=settings.http.HTTP_COMPRESSION_MIN_SIZE
+    )
 
 # Добавляем CORS middleware, если нужно
 app.add_middleware(
@@ -43,6 +35,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Заголовки безопасности, идентификатор запроса, Server-Timing и метрики.
+# Внешний слой: заголовки получают и ответы CORS, время учитывает все middleware
+app.add_middleware(
+    RequestMiddleware,
+    security_headers=settings.http.HTTP_SECURITY_HEADERS,
+    request_id_header=settings.http.HTTP_REQUEST_ID_HEADER or None,
+    server_timing=settings.http.HTTP_SERVER_TIMING,
+    metrics=settings.http.HTTP_METRICS,
+)
+
 app.include_router(router=router_v1, prefix=settings.api_v1_prefix)
 
 
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру LRU кэш с необязательным временем жизни записей.
+    С maxweight ограничивается и суммарный вес записей, например объём в байтах
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        maxweight: int | None = None,
+        weigh: Callable[[Any], int] | None = None,
+    ):
+        """
+        :param maxsize: Число записей
+        :param maxweight: (Optional) Суммарный вес записей
+        :param weigh: (Optional) Вес записи, по умолчанию 1
+        """
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.weigh = weigh or (lambda value: 1)
+        self.weight = 0
+        self._data: OrderedDict[Hashable, tuple[Any, float | None, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        Сохранить значение
+        :param key: Ключ
+        :param value: Значение
+        :param ttl: (Optional) Время жизни, сек. Без него запись вытесняется только по размеру
+        """
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self.pop(key)
+        weight = self.weigh(value)
+        self._data[key] = (value, expires_at, weight)
+        self.weight += weight
+        self._evict()
+
+    def reweigh(self, key: Hashable) -> None:
+        """Пересчитать вес записи, значение которой изменилось на месте"""
+        entry = self._data.get(key)
+        if entry is None:
+            return
+        value, expires_at, weight = entry
+        new_weight = self.weigh(value)
+        self._data[key] = (value, expires_at, new_weight)
+        self.weight += new_weight - weight
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._data) > self.maxsize or (
+            self.maxweight is not None and self.weight > self.maxweight
+        ):
+            _, (_, _, weight) = self._data.popitem(last=False)
+            self.weight -= weight
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self.weight -= entry[2]
+        return entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def stats(self) -> dict:
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self.maxweight is not None:
+            stats.update(weight=self.weight, maxweight=self.maxweight)
+        return stats
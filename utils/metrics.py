@@ -0,0 +1,200 @@
+from bisect import bisect_left
+from collections.abc import Callable
+
+# Границы корзин гистограмм задержек, сек.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _sort_key(item: tuple) -> tuple:
+    # Значения меток могут быть числами и строками вперемешку, например статус
+    # ответа 200 и "timeout": сравниваются в строковом виде
+    return tuple(map(str, item[0]))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Счётчик с метками. Значения меток передаются позиционно в порядке labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+            for values, value in sorted(self._values.items(), key=_sort_key)
+        ]
+
+
+class Histogram:
+    """
+    Гистограмма с метками. Наблюдение - поиск корзины делением пополам
+    и увеличение одного счётчика, накопительные значения считаются при выдаче.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счётчики корзин..., счётчик сверх последней границы, сумма]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._values.get(label_values)
+        if series is None:
+            series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *label_values) -> int:
+        series = self._values.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for values, series in sorted(self._values.items(), key=_sort_key):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels, values, f'le="{_format_value(float(bound))}"'
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Метрика, значения которой читаются из callback при выдаче, например
+    счётчики кэшей и состояние пула соединений. Наблюдений нет, поэтому
+    накладных расходов на горячем пути тоже нет.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], float | dict[tuple, float]],
+        labels: tuple[str, ...] = (),
+        kind: str = "gauge",
+    ):
+        """
+        :param callback: Значение или словарь {значения меток: значение}
+        :param kind: Тип метрики Prometheus: gauge или counter
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = labels
+        self.kind = kind
+
+    def samples(self) -> list[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items(), key=_sort_key)
+        ]
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса с выдачей в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | CallbackMetric] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], float | dict[tuple, float]],
+        labels: tuple[str, ...] = (),
+        kind: str = "gauge",
+    ) -> CallbackMetric:
+        return self.register(
+            CallbackMetric(name, documentation, callback, labels, kind)
+        )
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"